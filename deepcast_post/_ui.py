@@ -0,0 +1,4 @@
+from rich.console import Console
+
+# Shared by the CLI and DeepcastGenerator so the terminal is only probed once
+CONSOLE = Console()
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import math
+import operator
+import os
+import sqlite3
+import tempfile
+import time
+from array import array
+from contextlib import closing
+from pathlib import Path
+
+# How long a cached response is reused before it is requested again
+DEFAULT_TTL = 7 * 24 * 60 * 60  # seconds
+
+# Minimum cosine similarity for SemanticCache to treat two inputs as the same
+DEFAULT_SIMILARITY_THRESHOLD = 0.92
+
+
+def default_cache_dir():
+    """Return the directory for cached responses ($XDG_CACHE_HOME/deepcast/responses)."""
+    cache_home = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(cache_home) / "deepcast" / "responses"
+
+
+def _atomic_write(path, text):
+    """Write text to path via a temporary file so readers never see a partial file.
+
+    The temporary file has a unique name, so processes filling the same key
+    at once never write into each other's file.
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with open(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class FileBackend:
+    """Stores each response as <key>.md with a <key>.json sidecar holding its expiry."""
+
+    def __init__(self, directory=None, ttl=DEFAULT_TTL):
+        self.directory = Path(directory) if directory else default_cache_dir()
+        self.ttl = ttl
+
+    def get(self, key):
+        """Return the stored value for key, or None if it is missing or expired.
+
+        Expired entries are deleted so the cache directory doesn't keep growing.
+        """
+        try:
+            meta = json.loads((self.directory / f"{key}.json").read_text(encoding="utf-8"))
+            if meta["expiresAt"] <= time.time():
+                self._delete(key)
+                return None
+            return (self.directory / f"{key}.md").read_text(encoding="utf-8")
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _delete(self, key):
+        """Remove the entry for key, sidecar first so it never points at missing content."""
+        for suffix in (".json", ".md"):
+            try:
+                (self.directory / f"{key}{suffix}").unlink()
+            except OSError:
+                pass
+
+    def set(self, key, value):
+        """Store value under key; failures only cost a future cache miss."""
+        created_at = time.time()
+        meta = {"createdAt": created_at, "expiresAt": created_at + self.ttl}
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # The sidecar goes last: an entry only counts once its content is in place
+            _atomic_write(self.directory / f"{key}.md", value)
+            _atomic_write(self.directory / f"{key}.json", json.dumps(meta))
+        except OSError:
+            pass
+
+
+class LLMCache:
+    """Cache of chat completion responses keyed on the full request."""
+
+    def __init__(self, backend=None):
+        self.backend = backend or FileBackend()
+
+    @staticmethod
+    def cache_key(request):
+        """Return the SHA-256 key for a chat completion request.
+
+        The key covers every request argument (model, system and user
+        messages, temperature, max_tokens), so changing any of them is a miss.
+        """
+        payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, request):
+        """Return the cached response for request, or None."""
+        return self.backend.get(self.cache_key(request))
+
+    def set(self, request, response):
+        """Store the response for request."""
+        self.backend.set(self.cache_key(request), response)
+
+
+class SemanticCache:
+    """Cache of responses looked up by embedding similarity instead of exact match.
+
+    Embeddings are stored in SQLite as float32 arrays and compared by cosine
+    similarity against entries recorded under the same namespace, so inputs
+    that differ only by whitespace or a few words can reuse a response.
+    """
+
+    def __init__(self, path=None, threshold=DEFAULT_SIMILARITY_THRESHOLD, ttl=DEFAULT_TTL):
+        self.path = Path(path) if path else default_cache_dir().parent / "semantic.sqlite3"
+        self.threshold = threshold
+        self.ttl = ttl
+
+    def _connect(self):
+        """Open the database, creating it and its table on first use."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "namespace TEXT NOT NULL, embedding BLOB NOT NULL, norm REAL NOT NULL, "
+            "response TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_namespace ON entries (namespace)")
+        return conn
+
+    def get(self, namespace, embedding):
+        """Return the response of the most similar entry above the threshold, or None."""
+        query = array("f", embedding)
+        query_norm = math.sqrt(sum(x * x for x in query))
+        if not query_norm:
+            return None
+
+        best, best_similarity = None, self.threshold
+        try:
+            with closing(self._connect()) as conn:
+                rows = conn.execute(
+                    "SELECT embedding, norm, response FROM entries "
+                    "WHERE namespace = ? AND expires_at > ?",
+                    (namespace, time.time())
+                )
+                for blob, norm, response in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    if len(vector) != len(query):
+                        continue
+                    similarity = sum(map(operator.mul, vector, query)) / (norm * query_norm)
+                    if similarity > best_similarity:
+                        best, best_similarity = response, similarity
+        except (sqlite3.Error, OSError):
+            return None
+        return best
+
+    def set(self, namespace, embedding, response):
+        """Store response under embedding; failures only cost a future cache miss.
+
+        Expired entries are deleted at the same time so the database doesn't
+        keep growing.
+        """
+        vector = array("f", embedding)
+        norm = math.sqrt(sum(x * x for x in vector))
+        if not norm:
+            return
+        try:
+            with closing(self._connect()) as conn, conn:
+                now = time.time()
+                conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+                conn.execute(
+                    "INSERT INTO entries VALUES (?, ?, ?, ?, ?)",
+                    (namespace, vector.tobytes(), norm, response, now + self.ttl)
+                )
+        except (sqlite3.Error, OSError):
+            pass
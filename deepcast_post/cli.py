@@ -1,24 +1,48 @@
 #!/usr/bin/env python3
 
 import argparse
+import functools
 import os
 import sys
-from dotenv import load_dotenv
-from rich.console import Console
-from rich.panel import Panel
 
-from deepcast_post.core import DeepcastGenerator
+# Load environment variables from .env file in project directory, if present
+_project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_env_path = os.path.join(_project_dir, '.env')
+if os.path.isfile(_env_path):
+    # Only pay for importing python-dotenv when there is a file to load
+    from dotenv import load_dotenv
+    load_dotenv(_env_path)
 
-# Load environment variables from .env file in project directory
-project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-env_path = os.path.join(project_dir, '.env')
-load_dotenv(env_path)
+def _console():
+    """Return the shared Rich console, importing Rich on first use."""
+    from deepcast_post._ui import CONSOLE
+    return CONSOLE
 
-console = Console()
+def _print_error(message, title, details=None):
+    """Print an error panel, with optional plain-text details below the message."""
+    from rich.panel import Panel
+    body = f"[red]Error: {message}[/red]"
+    if details:
+        body += f"\n{details}"
+    _console().print(Panel(body, title=title, border_style="red"))
+
+def _enable_verbose_logging():
+    """Show the generator's progress messages on the console."""
+    import logging
+    from rich.logging import RichHandler
+    package_logger = logging.getLogger("deepcast_post")
+    package_logger.setLevel(logging.INFO)
+    package_logger.addHandler(RichHandler(
+        console=_console(), show_time=False, show_level=False, show_path=False
+    ))
 
 def show_cost_warning():
-    """Display cost information to the user."""
-    console.print(Panel(
+    """Display cost information to the user (interactive terminals only)."""
+    if not sys.stdout.isatty():
+        return
+    
+    from rich.panel import Panel
+    _console().print(Panel(
         "[yellow]💰 Cost Information:[/yellow]\n"
         "• Default model: GPT-4o-mini (~$0.004 per transcript)\n"
         "• GPT-4o: ~$0.11 per transcript\n"
@@ -28,41 +52,107 @@ def show_cost_warning():
         border_style="yellow"
     ))
 
-def main():
+_DEFAULT_MODEL = "gpt-4o-mini"
+_DEFAULT_TEMPERATURE = 0.7
+
+def build_parser():
+    """Build the deepcast command line parser."""
+    # Python 3.14+ probes the terminal for colour support on every add_argument
+    extra = {"color": False} if sys.version_info >= (3, 14) else {}
     parser = argparse.ArgumentParser(
         prog="deepcast",
         description="Generate Deepcast Breakdown from diarized transcript",
-        epilog="Example: deepcast transcript.txt"
+        epilog="Example: deepcast transcript.txt",
+        **extra
     )
     parser.add_argument("transcript_path", help="Path to the diarized transcript file")
     parser.add_argument("--output-path", help="Path for output file (default: {transcript}-deepcast.md)")
-    parser.add_argument("--model", default="gpt-4o-mini", help="OpenAI model to use (default: gpt-4o-mini)")
-    parser.add_argument("--temperature", type=float, default=0.7, help="Temperature for generation (default: 0.7)")
+    parser.add_argument("--model", default=_DEFAULT_MODEL, help=f"OpenAI model to use (default: {_DEFAULT_MODEL})")
+    parser.add_argument("--temperature", type=float, default=_DEFAULT_TEMPERATURE, help=f"Temperature for generation (default: {_DEFAULT_TEMPERATURE})")
     parser.add_argument("--verbose", "-v", action="store_true", help="Verbose output")
     parser.add_argument("--no-cost-warning", action="store_true", help="Suppress cost warning")
+    parser.add_argument("--cache", action="store_true", help="Reuse cached responses for identical requests for up to 7 days (stored in ~/.cache/deepcast)")
+    return parser
+
+@functools.lru_cache(maxsize=1)
+def _get_parser():
+    """Return the shared parser, built on first use."""
+    return build_parser()
+
+# Options the hand-rolled parser understands, mapped to their Namespace attribute
+_FLAGS = {"--verbose": "verbose", "-v": "verbose", "--no-cost-warning": "no_cost_warning", "--cache": "cache"}
+_OPTIONS = {"--output-path": "output_path", "--model": "model", "--temperature": "temperature"}
+
+def _fast_parse_args(argv):
+    """Parse well-formed argv without argparse, or return None to defer to it."""
+    values = {
+        "transcript_path": None,
+        "output_path": None,
+        "model": _DEFAULT_MODEL,
+        "temperature": _DEFAULT_TEMPERATURE,
+        "verbose": False,
+        "no_cost_warning": False,
+        "cache": False,
+    }
+    args = iter(argv)
+    for arg in args:
+        if arg in _FLAGS:
+            values[_FLAGS[arg]] = True
+        elif arg in _OPTIONS:
+            value = next(args, None)
+            if value is None or value.startswith("-"):
+                return None
+            values[_OPTIONS[arg]] = value
+        elif arg.startswith("-") or values["transcript_path"] is not None:
+            return None
+        else:
+            values["transcript_path"] = arg
+    if values["transcript_path"] is None:
+        return None
+    try:
+        values["temperature"] = float(values["temperature"])
+    except ValueError:
+        return None
+    return argparse.Namespace(**values)
+
+def _parse_args(argv):
+    """Parse command line arguments (excluding the program name).
+
+    --help, unknown options and malformed input fall through to argparse so
+    usage and error messages stay consistent.
+    """
+    return _fast_parse_args(argv) or _get_parser().parse_args(argv)
+
+def main():
+    args = _parse_args(sys.argv[1:])
     
-    args = parser.parse_args()
+    # Validate OpenAI API key
+    if not os.getenv("OPENAI_API_KEY"):
+        _print_error(
+            "OPENAI_API_KEY environment variable not set",
+            "Configuration Error",
+            "Please set your OpenAI API key:\n"
+            "export OPENAI_API_KEY='your-api-key-here'"
+        )
+        sys.exit(1)
     
     # Show cost warning unless suppressed
     if not args.no_cost_warning:
         show_cost_warning()
     
-    # Validate OpenAI API key
-    if not os.getenv("OPENAI_API_KEY"):
-        console.print(Panel(
-            "[red]Error: OPENAI_API_KEY environment variable not set[/red]\n"
-            "Please set your OpenAI API key:\n"
-            "export OPENAI_API_KEY='your-api-key-here'",
-            title="Configuration Error",
-            border_style="red"
-        ))
-        sys.exit(1)
+    if args.verbose:
+        _enable_verbose_logging()
+    
+    # Deferred so --help, argument errors and a missing API key don't pay for
+    # importing the generator module
+    from deepcast_post.core import DeepcastGenerator
     
     try:
         generator = DeepcastGenerator(
             model=args.model,
             temperature=args.temperature,
-            verbose=args.verbose
+            verbose=args.verbose,
+            cache=args.cache
         )
         
         generator.generate_breakdown(
@@ -71,11 +161,7 @@ def main():
         )
         
     except Exception as e:
-        console.print(Panel(
-            f"[red]Error: {str(e)}[/red]",
-            title="Generation Failed",
-            border_style="red"
-        ))
+        _print_error(str(e), "Generation Failed")
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -1,37 +1,342 @@
-import openai
+import asyncio
+import functools
+import importlib.util
+import logging
+import mmap
 import os
-from rich.console import Console
+import re
+import secrets
+import shutil
+import stat
+from typing import NamedTuple, Optional
 from rich.panel import Panel
-from rich.progress import Progress, SpinnerColumn, TextColumn
+
+from deepcast_post._ui import CONSOLE
+from deepcast_post.cache import DEFAULT_SIMILARITY_THRESHOLD, LLMCache, SemanticCache
+
+logger = logging.getLogger(__name__)
+
+# Static parts of the deepcast prompt; the transcript goes between them
+_PROMPT_PREFIX = """
+This is the diarized transcript of a podcast episode. I want a deep, structured breakdown that goes far beyond a summary. Your output should include:
+
+1. A full thematic breakdown of the episode's main ideas and arguments, organized by topic or theme.  
+2. Timestamped key takeaways for each major point.  
+3. Speaker-organized notes — identify each speaker and summarize their contributions, perspective, and tone.  
+4. Extracted quotes — especially insightful or memorable lines with timestamps.  
+
+Please format the output in **Markdown**, using:
+- `##` for section headings  
+- `**Speaker Name:**` for speaker notes  
+- Bulleted lists with consistent formatting
+- Timestamps in `[mm:ss]` or `[hh:mm:ss]` format where appropriate
+
+**CRITICAL FORMATTING RULES FOR NOTION COMPATIBILITY:**
+- Use `- **Label:** Text` format for bullet points with labels
+- Do NOT use inline bullet points like `**Label:** * Text * More text`
+- Keep bullet points simple: one label per bullet, one description per bullet
+- Use proper markdown: `**bold**` for emphasis, `- ` for lists
+- Ensure all markdown syntax is properly closed and escaped
+- Use consistent spacing and formatting throughout
+
+End with a 5–7 bullet executive summary suitable for a slide or internal briefing.
+
+Here is the diarized transcript:
+"""
+_PROMPT_SUFFIX = "\n"
+
+# System message shared by every chat completion request
+_SYSTEM_MESSAGE = {"role": "system", "content": "You are a senior podcast analyst."}
+
+# Prompt for merging per-chunk breakdowns of a long transcript into one
+_REDUCE_PROMPT_PREFIX = """
+The following are deepcast breakdowns of consecutive segments of a single podcast episode. Merge them into one breakdown of the whole episode that follows the same structure and Markdown formatting as the segments:
+
+- Combine overlapping themes instead of repeating them per segment
+- Keep one set of notes per speaker
+- Keep the most insightful quotes with their timestamps
+- End with a single 5–7 bullet executive summary for the whole episode
+
+Here are the segment breakdowns, in order:
+"""
+
+# Runs of spaces/tabs, and line breaks with surrounding spaces or blank lines
+_WS_RE = re.compile(r"[ \t]+")
+_BLANK_RE = re.compile(r" ?\n[ \n]*")
+
+
+# Retries the OpenAI SDK makes on rate limits (429), timeouts and 5xx errors,
+# with exponential backoff and jitter, before a request fails
+_MAX_RETRIES = 5
+
+# Chat completion requests in flight at once for a batch or a chunked transcript
+_DEFAULT_CONCURRENCY = 8
+
+# Buffer size for writing streamed output
+_WRITE_BUFFER_SIZE = 1 << 16
+
+
+def _create_part_file(output_path):
+    """Create a uniquely named .part file next to output_path; return its fd and path.
+    
+    Created with mode 0o666 so the kernel applies the umask, as open() does.
+    """
+    directory, name = os.path.split(os.fspath(output_path))
+    while True:
+        tmp_path = os.path.join(directory, f"{name}.{secrets.token_hex(4)}.part")
+        try:
+            return os.open(tmp_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666), tmp_path
+        except FileExistsError:
+            continue
+
+
+# Embedding model for the semantic cache, and its input limit
+_EMBEDDING_MODEL = "text-embedding-3-small"
+_EMBEDDING_MAX_TOKENS = 8191
+
+
+# Context windows (prompt + completion tokens) of known models, matched by
+# name prefix with more specific names first
+_CONTEXT_WINDOWS = (
+    ("gpt-4o", 128000),
+    ("gpt-4.1", 1047576),
+    ("gpt-4.5", 128000),
+    ("gpt-4-turbo", 128000),
+    ("gpt-4-1106", 128000),
+    ("gpt-4-0125", 128000),
+    ("gpt-4-vision", 128000),
+    ("gpt-4-32k", 32768),
+    ("gpt-4", 8192),
+    ("gpt-3.5-turbo", 16385),
+)
+
+# Context window tokens kept free for the prompt template and system message
+_PROMPT_OVERHEAD_TOKENS = 1024
+
+
+def _context_window(model):
+    """Return the context window of model in tokens, or None if it isn't known."""
+    for prefix, window in _CONTEXT_WINDOWS:
+        if model.startswith(prefix):
+            return window
+    return None
+
+
+# Where transcript segments may start, in order of preference: timestamped
+# lines ("[00:12:34] Speaker A: ..."), speaker-labelled lines ("Speaker A: ..."),
+# any non-empty line, then sentences and words within a line
+_SEGMENT_RES = (
+    re.compile(r"^\[", re.MULTILINE),
+    re.compile(r"^[^\s\[:][^:\n]{0,40}:", re.MULTILINE),
+    re.compile(r"^(?=.)", re.MULTILINE),
+    re.compile(r"(?<=[.!?]\s)(?=\S)"),
+    re.compile(r"(?<=\s)(?=\S)"),
+)
+
+
+def _approx_tokens(text):
+    """Estimate 1 token ≈ 4 characters."""
+    return len(text) >> 2
+
+
+def _split_segments(text, max_tokens, count_tokens, level=0):
+    """Yield (segment, tokens) for consecutive segments of text.
+    
+    Splits at the first pattern in _SEGMENT_RES[level:] that finds a
+    boundary, and splits each segment still over max_tokens again at the
+    finer patterns.
+    """
+    for level in range(level, len(_SEGMENT_RES)):
+        boundaries = [m.start() for m in _SEGMENT_RES[level].finditer(text) if m.start() > 0]
+        if boundaries:
+            break
+    else:
+        yield text, count_tokens(text)
+        return
+    
+    start = 0
+    for end in boundaries + [len(text)]:
+        segment = text[start:end]
+        tokens = count_tokens(segment)
+        if tokens > max_tokens and level + 1 < len(_SEGMENT_RES):
+            yield from _split_segments(segment, max_tokens, count_tokens, level + 1)
+        else:
+            yield segment, tokens
+        start = end
+
+
+def _chunk_transcript(text, max_tokens, count_tokens=_approx_tokens):
+    """Split a transcript into chunks of roughly max_tokens at segment starts.
+    
+    Returns (chunk, tokens) pairs, tokens being the sum of count_tokens over
+    the chunk's segments. Segments start at timestamp lines, or at
+    speaker-labelled or plain lines when the transcript has none; a segment
+    over the budget is split at finer boundaries down to single words. A
+    word longer than the budget becomes a chunk of its own, so callers must
+    check chunk sizes.
+    """
+    chunks = []
+    chunk_start = chunk_end = 0
+    chunk_tokens = 0
+    for segment, segment_tokens in _split_segments(text, max_tokens, count_tokens):
+        if chunk_tokens + segment_tokens > max_tokens and chunk_end > chunk_start:
+            chunks.append((text[chunk_start:chunk_end], chunk_tokens))
+            chunk_start = chunk_end
+            chunk_tokens = 0
+        chunk_tokens += segment_tokens
+        chunk_end += len(segment)
+    chunks.append((text[chunk_start:], chunk_tokens))
+    return chunks
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model):
+    """Return the tiktoken encoding for model, or None if tiktoken isn't installed."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def _http_client_kwargs(openai, asynchronous=False):
+    """Return OpenAI client kwargs enabling HTTP/2 with long-lived keep-alive.
+    
+    HTTP/2 lets concurrent batch and chunk requests share one connection.
+    Returns no overrides when the optional h2 package isn't installed.
+    """
+    if importlib.util.find_spec("h2") is None:
+        return {}
+    import httpx
+
+    limits = httpx.Limits(max_keepalive_connections=16, keepalive_expiry=60.0)
+    client_cls = openai.DefaultAsyncHttpxClient if asynchronous else openai.DefaultHttpxClient
+    return {"http_client": client_cls(http2=True, limits=limits)}
+
+
+def _read_mapped(f):
+    """Decode a binary file as UTF-8, straight from a memory map when possible.
+    
+    Decoding from the mapping skips the intermediate bytes copy that read()
+    makes. Pipes, FIFOs and empty files cannot be mapped and are read
+    normally. Line endings are normalized to "\\n" as in text mode.
+    """
+    info = os.fstat(f.fileno())
+    if not stat.S_ISREG(info.st_mode) or info.st_size == 0:
+        text = f.read().decode("utf-8")
+    else:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            text = str(mapped, "utf-8")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+@functools.lru_cache(maxsize=4)
+def _openai_client(api_key):
+    """Return an OpenAI client for api_key, shared by every generator using that key.
+    
+    Reusing one client keeps its connection pool, so later generators (and
+    batch runs) skip new TLS handshakes. Call ``_openai_client.cache_clear()``
+    to drop the cached clients.
+    """
+    import openai
+
+    return openai.OpenAI(api_key=api_key, max_retries=_MAX_RETRIES, **_http_client_kwargs(openai))
+
+
+class _Config(NamedTuple):
+    """Settings resolved from OPENAI_* environment variables."""
+    model: str
+    temperature: float
+    api_key: Optional[str]
+    max_tokens: int
+    max_input_tokens: int
+
+
+@functools.lru_cache(maxsize=1)
+def _load_config():
+    """Read OPENAI_* environment variables once per process.
+
+    Resolved lazily on first use rather than at import so values loaded from
+    .env by the CLI are picked up. Call ``_load_config.cache_clear()`` after
+    changing the environment.
+    """
+    return _Config(
+        model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+        temperature=float(os.getenv("OPENAI_TEMPERATURE", "0.7")),
+        api_key=os.getenv("OPENAI_API_KEY"),
+        max_tokens=int(os.getenv("OPENAI_MAX_TOKENS", "8000")),
+        max_input_tokens=int(os.getenv("OPENAI_MAX_INPUT_TOKENS", "50000")),  # ~40k words
+    )
+
 
 class DeepcastGenerator:
-    """Generates deepcast breakdowns from diarized transcripts using OpenAI API."""
+    """Generates deepcast breakdowns from diarized transcripts using OpenAI API.
     
-    def __init__(self, model=None, temperature=None, verbose=False, max_tokens=None):
-        self.console = Console()
+    With verbose=True, progress messages are logged at INFO on the
+    deepcast_post logger; the CLI shows them on the console.
+    """
+    
+    def __init__(self, model=None, temperature=None, verbose=False, max_tokens=None,
+                 chunk_long_transcripts=False, cache=False, semantic_cache=False,
+                 similarity_threshold=DEFAULT_SIMILARITY_THRESHOLD, client=None, async_client=None):
+        self.console = CONSOLE
         
         # Load configuration from environment variables with defaults
-        self.model = model or os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-        self.temperature = temperature or float(os.getenv("OPENAI_TEMPERATURE", "0.7"))
+        config = _load_config()
+        self.model = model or config.model
+        self.temperature = config.temperature if temperature is None else temperature
         self.verbose = verbose
         
         # Cost guardrails and token limits
-        self.max_tokens = max_tokens or int(os.getenv("OPENAI_MAX_TOKENS", "8000"))
-        self.max_input_tokens = int(os.getenv("OPENAI_MAX_INPUT_TOKENS", "50000"))  # ~40k words
+        self.max_tokens = max_tokens or config.max_tokens
+        self.max_input_tokens = config.max_input_tokens
+        # Reject transcripts locally rather than have the API refuse a prompt
+        # that can't fit in the model's context window alongside the output
+        window = _context_window(self.model)
+        if window is not None:
+            # Output gets at most half of the window left after the prompt
+            # template, so the transcript always has room for the other half
+            room = window - _PROMPT_OVERHEAD_TOKENS
+            self.max_tokens = min(self.max_tokens, room // 2)
+            self.max_input_tokens = min(self.max_input_tokens, room - self.max_tokens)
+        # Split transcripts over max_input_tokens instead of rejecting them
+        self.chunk_long_transcripts = chunk_long_transcripts
+        
+        # Reuse stored responses for identical requests
+        self.cache = cache
+        self._response_cache = LLMCache() if cache else None
+        # Reuse responses for near-duplicate transcripts, matched by embedding
+        self._semantic_cache = SemanticCache(threshold=similarity_threshold) if semantic_cache else None
         
         # Set OpenAI API key
-        self.api_key = os.getenv("OPENAI_API_KEY")
-        if not self.api_key:
+        self.api_key = config.api_key
+        # OpenAI-compatible clients to use instead of ones built from the API key:
+        # client for single requests, async_client for chunked and batch generation
+        if client is not None:
+            self._client = client
+        self._async_client = async_client
+        if not self.api_key and client is None and async_client is None:
             raise ValueError("OPENAI_API_KEY environment variable not set")
     
     def estimate_tokens(self, text):
-        """Rough token estimation (1 token ≈ 0.75 words for English text)."""
-        word_count = len(text.split())
-        return int(word_count * 1.33)  # Conservative estimate
+        """Count tokens with tiktoken when installed, else estimate 1 token ≈ 4 characters."""
+        encoding = _encoding(self.model)
+        if encoding is None:
+            return len(text) >> 2
+        return len(encoding.encode(text, disallowed_special=()))
     
-    def validate_transcript_size(self, transcript):
-        """Validate transcript size to prevent excessive costs."""
-        estimated_tokens = self.estimate_tokens(transcript)
+    def validate_transcript_size(self, transcript, estimated_tokens=None):
+        """Validate transcript size to prevent excessive costs.
+        
+        Pass estimated_tokens when the transcript has already been counted.
+        """
+        if estimated_tokens is None:
+            estimated_tokens = self.estimate_tokens(transcript)
         
         if estimated_tokens > self.max_input_tokens:
             raise ValueError(
@@ -41,15 +346,16 @@ class DeepcastGenerator:
             )
         
         if self.verbose:
-            self.console.print(f"📊 Estimated tokens: {estimated_tokens:,}")
+            logger.info("📊 Estimated tokens: %s", f"{estimated_tokens:,}")
         
         return estimated_tokens
     
     def load_transcript(self, transcript_path):
-        """Load transcript from file."""
+        """Load transcript from file, collapsing whitespace that would only cost tokens."""
         try:
-            with open(transcript_path, "r", encoding="utf-8") as f:
-                return f.read()
+            with open(transcript_path, "rb") as f:
+                text = _read_mapped(f)
+            return _BLANK_RE.sub("\n", _WS_RE.sub(" ", text)).strip()
         except FileNotFoundError:
             raise FileNotFoundError(f"Transcript file not found: {transcript_path}")
         except Exception as e:
@@ -57,97 +363,364 @@ class DeepcastGenerator:
     
     def build_prompt(self, transcript):
         """Build the prompt for OpenAI API."""
-        return f"""
-This is the diarized transcript of a podcast episode. I want a deep, structured breakdown that goes far beyond a summary. Your output should include:
-
-1. A full thematic breakdown of the episode's main ideas and arguments, organized by topic or theme.  
-2. Timestamped key takeaways for each major point.  
-3. Speaker-organized notes — identify each speaker and summarize their contributions, perspective, and tone.  
-4. Extracted quotes — especially insightful or memorable lines with timestamps.  
-
-Please format the output in **Markdown**, using:
-- `##` for section headings  
-- `**Speaker Name:**` for speaker notes  
-- Bulleted lists with consistent formatting
-- Timestamps in `[mm:ss]` or `[hh:mm:ss]` format where appropriate
-
-**CRITICAL FORMATTING RULES FOR NOTION COMPATIBILITY:**
-- Use `- **Label:** Text` format for bullet points with labels
-- Do NOT use inline bullet points like `**Label:** * Text * More text`
-- Keep bullet points simple: one label per bullet, one description per bullet
-- Use proper markdown: `**bold**` for emphasis, `- ` for lists
-- Ensure all markdown syntax is properly closed and escaped
-- Use consistent spacing and formatting throughout
-
-End with a 5–7 bullet executive summary suitable for a slide or internal briefing.
-
-Here is the diarized transcript:
-{transcript}
-"""
+        return _PROMPT_PREFIX + transcript + _PROMPT_SUFFIX
+    
+    @functools.cached_property
+    def _client(self):
+        """OpenAI client, created on first use and shared with other generators."""
+        self._require_api_key("client")
+        return _openai_client(self.api_key)
+    
+    def _require_api_key(self, injected):
+        """Raise ValueError if an OpenAI client must be built but there is no API key."""
+        if not self.api_key:
+            raise ValueError(f"OPENAI_API_KEY environment variable not set (or pass {injected}=)")
+    
+    def _completion_kwargs(self, prompt):
+        """Build the chat completion request arguments for a prompt."""
+        return dict(
+            model=self.model,
+            messages=[
+                _SYSTEM_MESSAGE,
+                {"role": "user", "content": prompt}
+            ],
+            temperature=self.temperature,
+            max_tokens=self.max_tokens
+        )
+    
+    def _cache_get(self, request):
+        """Return the cached response for request, or None on a miss or when caching is off."""
+        if self._response_cache is None:
+            return None
+        return self._response_cache.get(request)
+    
+    def _cache_set(self, request, markdown):
+        """Store the response for request when caching is on."""
+        if self._response_cache is not None:
+            self._response_cache.set(request, markdown)
+    
+    def _embed_transcript(self, transcript):
+        """Return the transcript's embedding for the semantic cache, or None if unavailable."""
+        if self._semantic_cache is None or self.estimate_tokens(transcript) > _EMBEDDING_MAX_TOKENS:
+            return None
+        try:
+            response = self._client.embeddings.create(model=_EMBEDDING_MODEL, input=transcript)
+            return response.data[0].embedding
+        except Exception:
+            return None
+    
+    def _semantic_namespace(self):
+        """Key for everything but the transcript, so only like-for-like requests match."""
+        return LLMCache.cache_key(self._completion_kwargs(self.build_prompt("")))
     
     def get_deepcast_breakdown(self, prompt):
         """Generate deepcast breakdown using OpenAI API."""
+        request = self._completion_kwargs(prompt)
+        cached = self._cache_get(request)
+        if cached is not None:
+            return cached
+        
         try:
-            client = openai.OpenAI()
-            response = client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a senior podcast analyst."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=self.temperature,
-                max_tokens=self.max_tokens
-            )
-            return response.choices[0].message.content
+            response = self._client.chat.completions.create(**request)
+            markdown = response.choices[0].message.content
+        except Exception as e:
+            raise Exception(f"OpenAI API error: {str(e)}")
+        
+        self._cache_set(request, markdown)
+        return markdown
+    
+    def stream_deepcast_breakdown(self, prompt):
+        """Generate deepcast breakdown using OpenAI API, yielding it piece by piece as it streams in."""
+        request = self._completion_kwargs(prompt)
+        cached = self._cache_get(request)
+        if cached is not None:
+            yield cached
+            return
+        
+        # Only keep the pieces around when they need to be cached
+        pieces = [] if self._response_cache is not None else None
+        try:
+            for chunk in self._client.chat.completions.create(**request, stream=True):
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                piece = chunk.choices[0].delta.content
+                if pieces is not None:
+                    pieces.append(piece)
+                yield piece
         except Exception as e:
             raise Exception(f"OpenAI API error: {str(e)}")
+        
+        if pieces is not None:
+            self._cache_set(request, "".join(pieces))
+    
+    @staticmethod
+    def _default_output_path(transcript_path):
+        """Return the default output path for a transcript."""
+        base = os.path.splitext(os.path.basename(transcript_path))[0]
+        return f"{base}-deepcast.md"
+    
+    @staticmethod
+    def _write_output(output_path, markdown):
+        """Write the generated Markdown to output_path.
+        
+        markdown is either a string or an iterable of string pieces (such as a
+        streamed response), which are written as they arrive. They go to a
+        uniquely named .part file next to output_path that replaces it only
+        once complete, so an interrupted run never leaves a truncated
+        breakdown behind.
+        """
+        if isinstance(markdown, str):
+            markdown = (markdown,)
+        tmp_path = None
+        try:
+            # A unique name, so concurrent writers never share a .part file
+            fd, tmp_path = _create_part_file(output_path)
+            with open(fd, "w", encoding="utf-8", buffering=_WRITE_BUFFER_SIZE) as f:
+                for piece in markdown:
+                    f.write(piece)
+                f.flush()
+                os.fsync(f.fileno())
+            # Keep the permissions of the breakdown being replaced, as writing in place would
+            try:
+                shutil.copymode(output_path, tmp_path)
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_path, output_path)
+        except BaseException as e:
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+            # Errors raised by the stream itself propagate unchanged
+            if isinstance(e, OSError):
+                raise Exception(f"Error writing output file: {str(e)}")
+            raise
     
     def generate_breakdown(self, transcript_path, output_path=None):
-        """Generate deepcast breakdown from transcript."""
+        """Generate deepcast breakdown from transcript.
+        
+        Raises ValueError if the transcript is over max_input_tokens and
+        chunk_long_transcripts is off.
+        """
         # Determine output path
         if output_path is None:
-            base = os.path.splitext(os.path.basename(transcript_path))[0]
-            output_path = f"{base}-deepcast.md"
+            output_path = self._default_output_path(transcript_path)
         
         # Load transcript
         if self.verbose:
-            self.console.print(f"📖 Loading transcript from: {transcript_path}")
+            logger.info("📖 Loading transcript from: %s", transcript_path)
         transcript = self.load_transcript(transcript_path)
         
         # Validate transcript size
         if self.verbose:
-            self.console.print(f"🔍 Validating transcript size...")
-        try:
-            self.validate_transcript_size(transcript)
-        except ValueError as e:
-            self.console.print(f"[red]Error: {e}[/red]")
-            return
+            logger.info("🔍 Validating transcript size...")
+        estimated_tokens = self.estimate_tokens(transcript)
+        chunked = self.chunk_long_transcripts and estimated_tokens > self.max_input_tokens
+        if not chunked:
+            self.validate_transcript_size(transcript, estimated_tokens)
         
         # Generate breakdown
         if self.verbose:
-            self.console.print(f"📡 Sending to OpenAI (Deepcast Breakdown)...")
-        
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            console=self.console,
-            transient=True
-        ) as progress:
-            task = progress.add_task("Generating deepcast breakdown...", total=None)
-            
+            logger.info("📡 Sending to OpenAI (Deepcast Breakdown)...")
+        else:
+            self.console.print("⏳ Generating deepcast breakdown...")
+        
+        if chunked:
+            markdown = self.get_chunked_deepcast_breakdown(transcript)
+        else:
             prompt = self.build_prompt(transcript)
-            markdown = self.get_deepcast_breakdown(prompt)
+            markdown = embedding = None
+            if self._semantic_cache is not None:
+                # An exact hit needs no embedding request; only look for a
+                # near-identical transcript on a miss
+                markdown = self._cache_get(self._completion_kwargs(prompt))
+                if markdown is None:
+                    embedding = self._embed_transcript(transcript)
+                if embedding is not None:
+                    markdown = self._semantic_cache.get(self._semantic_namespace(), embedding)
+                    if markdown is not None and self.verbose:
+                        logger.info("♻️  Reusing the breakdown of a near-identical transcript")
+            if markdown is None:
+                markdown = self.stream_deepcast_breakdown(prompt)
+                if embedding is not None:
+                    # The semantic cache needs the whole breakdown, so collect it first
+                    markdown = "".join(markdown)
+                    self._semantic_cache.set(self._semantic_namespace(), embedding, markdown)
         
         # Save output
-        try:
-            with open(output_path, "w", encoding="utf-8") as f:
-                f.write(markdown)
-        except Exception as e:
-            raise Exception(f"Error writing output file: {str(e)}")
+        self._write_output(output_path, markdown)
         
         # Success message
         self.console.print(Panel(
             f"[green]✅ Deepcast Markdown saved to: {output_path}[/green]",
             title="Success",
             border_style="green"
-        )) 
\ No newline at end of file
+        ))
+    
+    async def _acomplete(self, client, prompt, semaphore=None):
+        """Generate a completion for prompt using an async OpenAI client.
+        
+        The request waits for a slot of semaphore, when given, before it is sent.
+        """
+        request = self._completion_kwargs(prompt)
+        cached = self._cache_get(request)
+        if cached is not None:
+            return cached
+        
+        try:
+            if semaphore is None:
+                response = await client.chat.completions.create(**request)
+            else:
+                async with semaphore:
+                    response = await client.chat.completions.create(**request)
+            markdown = response.choices[0].message.content
+        except Exception as e:
+            raise Exception(f"OpenAI API error: {str(e)}")
+        
+        self._cache_set(request, markdown)
+        return markdown
+    
+    async def _amap_reduce(self, client, transcript, semaphore=None):
+        """Break down transcript chunks concurrently, then merge the results.
+        
+        Chunk requests share semaphore, or else one allowing
+        _DEFAULT_CONCURRENCY requests in flight.
+        """
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(_DEFAULT_CONCURRENCY)
+        chunks = _chunk_transcript(transcript, self.max_input_tokens, self.estimate_tokens)
+        if self.verbose:
+            logger.info("✂️  Splitting transcript into %d chunks...", len(chunks))
+        for _, estimated_tokens in chunks:
+            self._check_chunk_size(estimated_tokens, "Transcript segment too large to split")
+        
+        partials = await asyncio.gather(
+            *(self._acomplete(client, self.build_prompt(chunk), semaphore) for chunk, _ in chunks)
+        )
+        if len(partials) == 1:
+            return partials[0]
+        
+        merged = "\n\n---\n\n".join(partials)
+        self._check_chunk_size(self.estimate_tokens(merged), "Chunk breakdowns too large to merge")
+        return await self._acomplete(client, _REDUCE_PROMPT_PREFIX + merged + _PROMPT_SUFFIX, semaphore)
+    
+    def _check_chunk_size(self, estimated_tokens, problem):
+        """Raise ValueError if estimated_tokens is over max_input_tokens."""
+        if estimated_tokens > self.max_input_tokens:
+            raise ValueError(
+                f"{problem}: estimated {estimated_tokens:,} tokens "
+                f"(max: {self.max_input_tokens:,})."
+            )
+    
+    async def _with_async_client(self, func, *args):
+        """Await func(client, *args) with an async OpenAI client.
+        
+        Uses the injected async_client, or else a fresh AsyncOpenAI client that
+        is closed afterwards.
+        """
+        if self._async_client is not None:
+            return await func(self._async_client, *args)
+        self._require_api_key("async_client")
+        import openai
+
+        client = openai.AsyncOpenAI(max_retries=_MAX_RETRIES, **_http_client_kwargs(openai, asynchronous=True))
+        try:
+            return await func(client, *args)
+        finally:
+            await client.close()
+    
+    async def aget_chunked_deepcast_breakdown(self, transcript):
+        """Generate a deepcast breakdown for a transcript too long for one request.
+        
+        The transcript is split at timestamp lines (or speaker-labelled or
+        plain lines, then sentences and words where those are too long) into
+        chunks that fit max_input_tokens, each chunk is broken down
+        concurrently, and the partial breakdowns are merged in a final
+        request. Raises ValueError if a single word, or the partial breakdowns
+        together, exceed max_input_tokens.
+        """
+        return await self._with_async_client(self._amap_reduce, transcript)
+    
+    def get_chunked_deepcast_breakdown(self, transcript):
+        """Run aget_chunked_deepcast_breakdown to completion; for callers without an event loop."""
+        return asyncio.run(self.aget_chunked_deepcast_breakdown(transcript))
+    
+    async def agenerate_breakdown(self, transcript_path, output_path=None):
+        """Generate a deepcast breakdown from transcript without blocking the event loop.
+        
+        The async counterpart of generate_breakdown. Returns the output path.
+        """
+        return await self._with_async_client(self._agenerate, transcript_path, output_path)
+    
+    async def _agenerate(self, client, transcript_path, output_path=None, semaphore=None):
+        """Generate one deepcast breakdown using a shared async OpenAI client.
+        
+        Requests wait for a slot of semaphore, when given, before being sent.
+        """
+        if output_path is None:
+            output_path = self._default_output_path(transcript_path)
+        
+        # File I/O runs in worker threads so other transcripts' requests keep flowing
+        transcript = await asyncio.to_thread(self.load_transcript, transcript_path)
+        
+        estimated_tokens = self.estimate_tokens(transcript)
+        if self.chunk_long_transcripts and estimated_tokens > self.max_input_tokens:
+            markdown = await self._amap_reduce(client, transcript, semaphore)
+        else:
+            self.validate_transcript_size(transcript, estimated_tokens)
+            markdown = await self._acomplete(client, self.build_prompt(transcript), semaphore)
+        
+        await asyncio.to_thread(self._write_output, output_path, markdown)
+        self.console.print(f"[green]✅ Deepcast Markdown saved to: {output_path}[/green]")
+        return output_path
+    
+    async def _agenerate_batch(self, client, transcript_paths, output_paths, concurrency):
+        """Run _agenerate over transcript_paths with at most `concurrency` requests in flight.
+        
+        Chunked transcripts' requests count toward the same limit. At most
+        `concurrency` transcripts are in progress at once, so the rest aren't
+        loaded into memory early.
+        """
+        transcripts = asyncio.Semaphore(concurrency)
+        requests = asyncio.Semaphore(concurrency)
+        
+        async def bounded(transcript_path, output_path):
+            async with transcripts:
+                return await self._agenerate(client, transcript_path, output_path, requests)
+        
+        return await asyncio.gather(
+            *(bounded(path, output) for path, output in zip(transcript_paths, output_paths)),
+            return_exceptions=True
+        )
+    
+    async def generate_breakdowns(self, transcript_paths, output_paths=None, concurrency=_DEFAULT_CONCURRENCY):
+        """Generate deepcast breakdowns for several transcripts concurrently.
+        
+        Each breakdown is written to the matching entry of output_paths, or to
+        its default output path when output_paths (or an entry in it) is None.
+        Returns one entry per transcript: the output path on success, or the
+        exception raised. Raises ValueError if two transcripts would be
+        written to the same output file.
+        """
+        transcript_paths = list(transcript_paths)
+        if output_paths is None:
+            output_paths = [None] * len(transcript_paths)
+        else:
+            output_paths = list(output_paths)
+            if len(output_paths) != len(transcript_paths):
+                raise ValueError("output_paths must have one entry per transcript")
+        
+        # Transcripts with the same name in different directories share a default output
+        seen = set()
+        for transcript_path, output_path in zip(transcript_paths, output_paths):
+            resolved = os.path.realpath(output_path or self._default_output_path(transcript_path))
+            if resolved in seen:
+                raise ValueError(f"Several transcripts would be written to the same output file: {resolved}")
+            seen.add(resolved)
+        
+        return await self._with_async_client(self._agenerate_batch, transcript_paths, output_paths, concurrency)
+    
+    def generate_batch(self, transcript_paths, output_paths=None, concurrency=_DEFAULT_CONCURRENCY):
+        """Run generate_breakdowns to completion; for callers without an event loop."""
+        return asyncio.run(self.generate_breakdowns(transcript_paths, output_paths, concurrency))
@@ -7,10 +7,14 @@ setup(
     author="Evan Hourigan",
     packages=find_packages(),
     install_requires=[
-        "openai>=1.0.0",
+        "openai>=1.17.0",
         "python-dotenv>=1.0.0",
         "rich>=13.0.0",
     ],
+    extras_require={
+        "tokens": ["tiktoken>=0.7.0"],
+        "http2": ["h2>=3.0.0"],
+    },
     entry_points={
         "console_scripts": [
             "deepcast=deepcast_post.cli:main",
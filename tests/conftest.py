@@ -1,10 +1,101 @@
+import copy
+import logging
 import pytest
-import tempfile
-import os
-from unittest.mock import patch
+from unittest.mock import AsyncMock, MagicMock, create_autospec
+
+from deepcast_post.core import _load_config, _openai_client
+
+
+@pytest.fixture(autouse=True)
+def _reset_config_cache():
+    """Re-read OPENAI_* variables for every test, since tests change the environment."""
+    _load_config.cache_clear()
+    yield
+    _load_config.cache_clear()
+
+
+@pytest.fixture(autouse=True)
+def _reset_client_cache():
+    """Drop shared OpenAI clients so every test sees its own openai.OpenAI mock."""
+    _openai_client.cache_clear()
+    yield
+    _openai_client.cache_clear()
 
 
 @pytest.fixture
+def package_logger():
+    """The deepcast_post logger, with the level and handlers the CLI sets restored afterwards."""
+    package_logger = logging.getLogger("deepcast_post")
+    level, handlers = package_logger.level, package_logger.handlers[:]
+    yield package_logger
+    package_logger.setLevel(level)
+    package_logger.handlers[:] = handlers
+
+
+@pytest.fixture
+def api_key(monkeypatch):
+    """Set a dummy OpenAI API key for the test."""
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    return "test-key"
+
+
+@pytest.fixture(scope="session")
+def _generator_template():
+    """Autospec'd DeepcastGenerator instance, introspected once per session."""
+    from deepcast_post.core import DeepcastGenerator
+    return create_autospec(DeepcastGenerator, instance=True)
+
+
+@pytest.fixture
+def mock_generator(_generator_template):
+    """Mock DeepcastGenerator instance with calls and side effects cleared for this test."""
+    _generator_template.reset_mock(return_value=True, side_effect=True)
+    return _generator_template
+
+
+@pytest.fixture
+def mock_generator_class(monkeypatch, mock_generator):
+    """Replace DeepcastGenerator with a mock class returning mock_generator."""
+    generator_class = MagicMock(return_value=mock_generator)
+    monkeypatch.setattr("deepcast_post.core.DeepcastGenerator", generator_class)
+    return generator_class
+
+
+@pytest.fixture
+def mock_console_print(monkeypatch):
+    """Capture what the CLI prints to its console."""
+    console = MagicMock()
+    monkeypatch.setattr("deepcast_post.cli._console", MagicMock(return_value=console))
+    return console.print
+
+
+@pytest.fixture
+def mock_print_error(monkeypatch):
+    """Record CLI error messages without rendering Rich panels."""
+    print_error = MagicMock()
+    monkeypatch.setattr("deepcast_post.cli._print_error", print_error)
+    return print_error
+
+
+@pytest.fixture
+def mock_exit(monkeypatch):
+    """Replace sys.exit so CLI error paths can be asserted on."""
+    exit_mock = MagicMock()
+    monkeypatch.setattr("sys.exit", exit_mock)
+    return exit_mock
+
+
+@pytest.fixture(scope="module")
+def generator():
+    """DeepcastGenerator shared by a test module, for tests of read-only methods."""
+    from deepcast_post.core import DeepcastGenerator
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("OPENAI_API_KEY", "test-key")
+        _load_config.cache_clear()
+        return DeepcastGenerator()
+
+
+@pytest.fixture(scope="session")
 def sample_transcript():
     """Sample transcript content for testing."""
     return """[00:00:00] Speaker A: Welcome to the podcast everyone.
@@ -14,45 +105,95 @@ def sample_transcript():
 [00:00:20] Speaker A: Let's dive into the main themes."""
 
 
-@pytest.fixture
-def sample_transcript_file(sample_transcript):
-    """Create a temporary transcript file for testing."""
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
-        f.write(sample_transcript)
-        temp_file = f.name
-    
-    yield temp_file
+@pytest.fixture(scope="session")
+def sample_transcript_file(sample_transcript, tmp_path_factory):
+    """Create a temporary transcript file shared by the session (tests only read it)."""
+    transcript_file = tmp_path_factory.mktemp("transcripts") / "sample_transcript.txt"
+    transcript_file.write_text(sample_transcript)
+    return str(transcript_file)
+
+
+@pytest.fixture(scope="session")
+def stream_response():
+    """Build a mocked streaming chat completion that yields text in a few pieces."""
+    def build(text, pieces=3):
+        size = max(1, -(-len(text) // pieces))
+        chunks = []
+        for start in range(0, len(text), size):
+            chunk = MagicMock()
+            chunk.choices[0].delta.content = text[start:start + size]
+            chunks.append(chunk)
+        return chunks
+    return build
+
+
+@pytest.fixture(scope="session")
+def _openai_client_template(stream_response):
+    """OpenAI client mock configured once per session and deep-copied for each test.
     
-    # Cleanup
-    try:
-        os.unlink(temp_file)
-    except OSError:
-        pass
+    chat.completions.create returns a response that reads as a regular
+    completion and, for stream=True requests, iterates as streamed chunks.
+    """
+    content = "# Generated Deepcast\n\nContent here"
+    client = MagicMock()
+    response = client.chat.completions.create.return_value
+    # A real list, since deepcopy shares the children MagicMock creates for
+    # item access, which would let per-test edits reach the template
+    response.choices = [MagicMock(message=MagicMock(content=content))]
+    response.__iter__.side_effect = lambda: iter(stream_response(content))
+    return client
 
 
 @pytest.fixture
-def mock_openai_client():
-    """Mock OpenAI client for testing."""
-    with patch('openai.OpenAI') as mock_client:
-        mock_response = mock_client.return_value.chat.completions.create.return_value
-        mock_response.choices[0].message.content = "Generated deepcast breakdown content"
-        yield mock_client
+def mock_openai_client(monkeypatch, _openai_client_template):
+    """Mock OpenAI client returned by every openai.OpenAI() call in the test.
+    
+    A deep copy of the session template, so calls and per-test overrides of
+    create's return value or side effect don't leak into other tests.
+    """
+    client = copy.deepcopy(_openai_client_template)
+    monkeypatch.setattr("openai.OpenAI", MagicMock(return_value=client))
+    return client
 
 
 @pytest.fixture
+def mock_async_openai_client(monkeypatch):
+    """Mock async OpenAI client returned by every openai.AsyncOpenAI() call in the test.
+    
+    chat.completions.create and close are awaitable; create's completion
+    reads "# Batch Deepcast" unless a test overrides it.
+    """
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock()
+    client.chat.completions.create.return_value.choices[0].message.content = "# Batch Deepcast"
+    client.close = AsyncMock()
+    monkeypatch.setattr("openai.AsyncOpenAI", MagicMock(return_value=client))
+    return client
+
+
+@pytest.fixture(scope="module")
 def mock_environment():
-    """Mock environment variables for testing."""
+    """Mock environment variables for the tests of a module.
+    
+    Module- rather than session-scoped so the variables are restored before
+    other test modules run. Tests can still override them with monkeypatch.
+    """
     env_vars = {
         "OPENAI_API_KEY": "test-api-key-12345",
         "OPENAI_MODEL": "gpt-4o-mini",
         "OPENAI_TEMPERATURE": "0.7"
     }
     
-    with patch.dict(os.environ, env_vars, clear=True):
+    with pytest.MonkeyPatch.context() as mp:
+        for name, value in env_vars.items():
+            mp.setenv(name, value)
+        # Only the other variables DeepcastGenerator reads need clearing
+        mp.delenv("OPENAI_MAX_TOKENS", raising=False)
+        mp.delenv("OPENAI_MAX_INPUT_TOKENS", raising=False)
         yield env_vars
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_deepcast_output():
     """Sample deepcast output for testing."""
     return """# Deepcast Breakdown
@@ -81,15 +222,7 @@ def sample_deepcast_output():
 - Need for balanced approach to AI integration"""
 
 
-@pytest.fixture
-def temp_output_dir():
-    """Create a temporary directory for output files."""
-    temp_dir = tempfile.mkdtemp()
-    yield temp_dir
-    
-    # Cleanup
-    try:
-        import shutil
-        shutil.rmtree(temp_dir)
-    except OSError:
-        pass
+@pytest.fixture(scope="session")
+def temp_output_dir(tmp_path_factory):
+    """Create a temporary directory for output files, shared by the session."""
+    return str(tmp_path_factory.mktemp("output"))
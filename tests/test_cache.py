@@ -0,0 +1,137 @@
+import json
+import os
+import pytest
+from contextlib import closing
+from unittest.mock import patch
+from deepcast_post.cache import FileBackend, LLMCache, SemanticCache
+
+
+def _request(**overrides):
+    request = dict(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": "You are a senior podcast analyst."},
+            {"role": "user", "content": "Test prompt"}
+        ],
+        temperature=0.7,
+        max_tokens=8000
+    )
+    request.update(overrides)
+    return request
+
+
+class TestLLMCache:
+    def test_cache_key_is_stable(self):
+        """Test equal requests map to the same key regardless of argument order."""
+        request = _request()
+        reordered = dict(reversed(list(request.items())))
+        assert LLMCache.cache_key(request) == LLMCache.cache_key(reordered)
+        assert len(LLMCache.cache_key(request)) == 64
+    
+    @pytest.mark.parametrize("overrides", [
+        {"model": "gpt-4o"},
+        {"temperature": 0.2},
+        {"max_tokens": 100},
+        {"messages": [{"role": "user", "content": "Other prompt"}]},
+    ], ids=["model", "temperature", "max_tokens", "messages"])
+    def test_cache_key_changes_with_request(self, overrides):
+        """Test any change to the request produces a different key."""
+        assert LLMCache.cache_key(_request(**overrides)) != LLMCache.cache_key(_request())
+    
+    def test_round_trip(self, tmp_path):
+        """Test a stored response is returned for the same request only."""
+        cache = LLMCache(FileBackend(tmp_path))
+        assert cache.get(_request()) is None
+        
+        cache.set(_request(), "# Breakdown")
+        
+        assert cache.get(_request()) == "# Breakdown"
+        assert cache.get(_request(temperature=0.2)) is None
+    
+    def test_expired_entry_is_a_miss(self, tmp_path):
+        """Test entries past their TTL are not returned."""
+        cache = LLMCache(FileBackend(tmp_path, ttl=-1))
+        cache.set(_request(), "# Breakdown")
+        assert cache.get(_request()) is None
+        assert list(tmp_path.iterdir()) == []
+    
+    def test_sidecar_records_expiry(self, tmp_path):
+        """Test each entry has a JSON sidecar with createdAt and expiresAt."""
+        backend = FileBackend(tmp_path, ttl=60)
+        backend.set("abc", "# Breakdown")
+        
+        meta = json.loads((tmp_path / "abc.json").read_text())
+        assert meta["expiresAt"] - meta["createdAt"] == 60
+        assert (tmp_path / "abc.md").read_text() == "# Breakdown"
+    
+    def test_concurrent_writes_use_separate_temp_files(self, tmp_path):
+        """Test writers filling the same key never share a temporary file."""
+        backend = FileBackend(tmp_path)
+        temp_paths = []
+        real_replace = os.replace
+        
+        def record_replace(src, dst):
+            temp_paths.append(src)
+            real_replace(src, dst)
+        
+        with patch("os.replace", side_effect=record_replace):
+            backend.set("abc", "# First")
+            backend.set("abc", "# Second")
+        
+        assert len(set(temp_paths)) == 4
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["abc.json", "abc.md"]
+        assert backend.get("abc") == "# Second"
+    
+    def test_corrupt_sidecar_is_a_miss(self, tmp_path):
+        """Test unreadable metadata is treated as a miss rather than an error."""
+        backend = FileBackend(tmp_path)
+        backend.set("abc", "# Breakdown")
+        (tmp_path / "abc.json").write_text("not json")
+        assert backend.get("abc") is None
+
+
+class TestSemanticCache:
+    def test_similar_embedding_hits(self, tmp_path):
+        """Test a near-identical embedding reuses the stored response."""
+        cache = SemanticCache(tmp_path / "semantic.sqlite3")
+        cache.set("settings", [1.0, 0.0, 0.0], "# Breakdown")
+        
+        assert cache.get("settings", [0.99, 0.05, 0.0]) == "# Breakdown"
+    
+    def test_dissimilar_embedding_misses(self, tmp_path):
+        """Test embeddings below the similarity threshold are a miss."""
+        cache = SemanticCache(tmp_path / "semantic.sqlite3")
+        cache.set("settings", [1.0, 0.0, 0.0], "# Breakdown")
+        
+        assert cache.get("settings", [0.5, 0.5, 0.5]) is None
+    
+    def test_most_similar_entry_wins(self, tmp_path):
+        """Test the closest stored embedding is returned when several qualify."""
+        cache = SemanticCache(tmp_path / "semantic.sqlite3", threshold=0.5)
+        cache.set("settings", [1.0, 0.2, 0.0], "# Close")
+        cache.set("settings", [1.0, 0.0, 0.0], "# Closest")
+        
+        assert cache.get("settings", [1.0, 0.01, 0.0]) == "# Closest"
+    
+    def test_namespaces_are_separate(self, tmp_path):
+        """Test entries recorded under other settings are never returned."""
+        cache = SemanticCache(tmp_path / "semantic.sqlite3")
+        cache.set("gpt-4o", [1.0, 0.0, 0.0], "# Breakdown")
+        
+        assert cache.get("gpt-4o-mini", [1.0, 0.0, 0.0]) is None
+    
+    def test_expired_entry_is_a_miss(self, tmp_path):
+        """Test entries past their TTL are not returned."""
+        cache = SemanticCache(tmp_path / "semantic.sqlite3", ttl=-1)
+        cache.set("settings", [1.0, 0.0, 0.0], "# Breakdown")
+        
+        assert cache.get("settings", [1.0, 0.0, 0.0]) is None
+    
+    def test_expired_entries_deleted_on_write(self, tmp_path):
+        """Test storing an entry removes the ones past their TTL."""
+        SemanticCache(tmp_path / "semantic.sqlite3", ttl=-1).set("settings", [1.0, 0.0, 0.0], "# Old")
+        cache = SemanticCache(tmp_path / "semantic.sqlite3")
+        cache.set("settings", [0.0, 1.0, 0.0], "# New")
+        
+        with closing(cache._connect()) as conn:
+            assert conn.execute("SELECT response FROM entries").fetchall() == [("# New",)]
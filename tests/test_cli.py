@@ -1,235 +1,196 @@
+import logging
 import pytest
-import os
 import sys
-from unittest.mock import patch, MagicMock
-from deepcast_post.cli import main
+from deepcast_post.cli import main, build_parser, _get_parser, _parse_args, _print_error, show_cost_warning
+
+# main() configures the deepcast_post logger for --verbose; undo that after each test
+pytestmark = pytest.mark.usefixtures("package_logger")
 
 
 class TestCLI:
-    def test_main_with_help(self):
+    def test_main_with_help(self, monkeypatch, mock_exit):
         """Test CLI help output."""
-        with patch('sys.argv', ['deepcast', '--help']):
-            with patch('sys.exit') as mock_exit:
-                # The help flag should cause argparse to exit with code 0
-                # But argparse requires a transcript_path argument, so it will fail first
-                main()
-                # Check that exit was called (either with 0 for help or 1 for error)
-                assert mock_exit.called
-                # The help should be displayed in stdout
+        monkeypatch.setattr("sys.argv", ['deepcast', '--help'])
+        # The help flag should cause argparse to exit with code 0
+        # But argparse requires a transcript_path argument, so it will fail first
+        main()
+        # Check that exit was called (either with 0 for help or 1 for error)
+        assert mock_exit.called
+        # The help should be displayed in stdout
     
-    def test_main_without_api_key(self):
+    def test_main_without_api_key(self, monkeypatch, mock_exit, mock_print_error):
         """Test CLI exits when OpenAI API key is not set."""
-        with patch('sys.argv', ['deepcast', 'transcript.txt']):
-            with patch.dict(os.environ, {}, clear=True):
-                with patch('sys.exit') as mock_exit:
-                    with patch('deepcast_post.cli.console.print') as mock_print:
-                        main()
-                        # The first exit call should be with code 1 for the API key error
-                        mock_exit.assert_called_with(1)
-                        
-                        # Verify error message was printed
-                        call_args = mock_print.call_args[0][0]
-                        # Access the panel content properly
-                        panel_content = str(call_args.renderable)
-                        assert "OPENAI_API_KEY environment variable not set" in panel_content
+        monkeypatch.setattr("sys.argv", ['deepcast', 'transcript.txt'])
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+        main()
+        # The first exit call should be with code 1 for the API key error
+        mock_exit.assert_called_with(1)
+        
+        # Verify error message was printed
+        assert "OPENAI_API_KEY environment variable not set" in mock_print_error.call_args[0][0]
     
-    def test_main_with_api_key_success(self):
+    def test_main_with_api_key_success(self, monkeypatch, api_key, mock_generator_class, mock_generator):
         """Test CLI success path with valid API key."""
-        with patch('sys.argv', ['deepcast', 'transcript.txt']):
-            with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-                # Mock the DeepcastGenerator class at the module level
-                with patch('deepcast_post.cli.DeepcastGenerator') as mock_generator_class:
-                    mock_generator = MagicMock()
-                    mock_generator_class.return_value = mock_generator
-                    
-                    # Mock the generate_breakdown method to avoid actual execution
-                    mock_generator.generate_breakdown.return_value = None
-                    
-                    main()
-                    
-                    # Verify generator was created with default parameters
-                    mock_generator_class.assert_called_once_with(
-                        model="gpt-4o-mini",
-                        temperature=0.7,
-                        verbose=False
-                    )
-                    
-                    # Verify breakdown was generated
-                    mock_generator.generate_breakdown.assert_called_once_with(
-                        transcript_path="transcript.txt",
-                        output_path=None
-                    )
+        monkeypatch.setattr("sys.argv", ['deepcast', 'transcript.txt'])
+        
+        main()
+        
+        # Verify generator was created with default parameters
+        mock_generator_class.assert_called_once_with(
+            model="gpt-4o-mini",
+            temperature=0.7,
+            verbose=False,
+            cache=False
+        )
+        
+        # Verify breakdown was generated
+        mock_generator.generate_breakdown.assert_called_once_with(
+            transcript_path="transcript.txt",
+            output_path=None
+        )
     
-    def test_main_with_custom_parameters(self):
-        """Test CLI with custom model and temperature."""
-        with patch('sys.argv', ['deepcast', 'transcript.txt', '--model', 'gpt-4', '--temperature', '0.5']):
-            with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-                with patch('deepcast_post.cli.DeepcastGenerator') as mock_generator_class:
-                    mock_generator = MagicMock()
-                    mock_generator_class.return_value = mock_generator
-                    mock_generator.generate_breakdown.return_value = None
-                    
-                    main()
-                    
-                    # Verify generator was created with custom parameters
-                    mock_generator_class.assert_called_once_with(
-                        model="gpt-4",
-                        temperature=0.5,
-                        verbose=False
-                    )
+    @pytest.mark.parametrize("argv,expected_kwargs,expected_output", [
+        (
+            ['deepcast', 'transcript.txt', '--model', 'gpt-4', '--temperature', '0.5'],
+            {"model": "gpt-4", "temperature": 0.5, "verbose": False, "cache": False},
+            None,
+        ),
+        (
+            ['deepcast', 'transcript.txt', '--verbose'],
+            {"model": "gpt-4o-mini", "temperature": 0.7, "verbose": True, "cache": False},
+            None,
+        ),
+        (
+            ['deepcast', 'transcript.txt', '-v'],
+            {"model": "gpt-4o-mini", "temperature": 0.7, "verbose": True, "cache": False},
+            None,
+        ),
+        (
+            ['deepcast', 'transcript.txt', '--cache'],
+            {"model": "gpt-4o-mini", "temperature": 0.7, "verbose": False, "cache": True},
+            None,
+        ),
+        (
+            ['deepcast', 'transcript.txt', '--output-path', 'custom-output.md'],
+            {"model": "gpt-4o-mini", "temperature": 0.7, "verbose": False, "cache": False},
+            "custom-output.md",
+        ),
+    ], ids=["custom_parameters", "verbose_flag", "short_verbose_flag", "cache_flag", "output_path"])
+    def test_main_with_options(self, monkeypatch, api_key, mock_generator_class, mock_generator,
+                               argv, expected_kwargs, expected_output):
+        """Test CLI options are passed through to the generator."""
+        monkeypatch.setattr("sys.argv", argv)
+        
+        main()
+        
+        mock_generator_class.assert_called_once_with(**expected_kwargs)
+        mock_generator.generate_breakdown.assert_called_once_with(
+            transcript_path="transcript.txt",
+            output_path=expected_output
+        )
     
-    def test_main_with_verbose_flag(self):
-        """Test CLI with verbose flag."""
-        with patch('sys.argv', ['deepcast', 'transcript.txt', '--verbose']):
-            with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-                with patch('deepcast_post.cli.DeepcastGenerator') as mock_generator_class:
-                    mock_generator = MagicMock()
-                    mock_generator_class.return_value = mock_generator
-                    mock_generator.generate_breakdown.return_value = None
-                    
-                    main()
-                    
-                    # Verify generator was created with verbose flag
-                    mock_generator_class.assert_called_once_with(
-                        model="gpt-4o-mini",
-                        temperature=0.7,
-                        verbose=True
-                    )
+    @pytest.mark.parametrize("error,expected_message", [
+        (Exception("Test error"), "Test error"),
+        (FileNotFoundError("File not found"), "File not found"),
+        (Exception("OpenAI API error: Rate limit exceeded"), "Rate limit exceeded"),
+    ], ids=["generator_exception", "file_not_found_exception", "openai_api_exception"])
+    def test_main_handles_generation_errors(self, monkeypatch, api_key, mock_generator_class, mock_generator,
+                                            mock_exit, mock_print_error, error, expected_message):
+        """Test CLI reports generator exceptions and exits with code 1."""
+        mock_generator.generate_breakdown.side_effect = error
+        monkeypatch.setattr("sys.argv", ['deepcast', 'transcript.txt'])
+        
+        main()
+        
+        # Verify error was printed
+        assert expected_message in mock_print_error.call_args[0][0]
+        
+        # Verify exit code
+        mock_exit.assert_called_once_with(1)
     
-    def test_main_with_short_verbose_flag(self):
-        """Test CLI with short verbose flag (-v)."""
-        with patch('sys.argv', ['deepcast', 'transcript.txt', '-v']):
-            with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-                with patch('deepcast_post.cli.DeepcastGenerator') as mock_generator_class:
-                    mock_generator = MagicMock()
-                    mock_generator_class.return_value = mock_generator
-                    mock_generator.generate_breakdown.return_value = None
-                    
-                    main()
-                    
-                    # Verify generator was created with verbose flag
-                    mock_generator_class.assert_called_once_with(
-                        model="gpt-4o-mini",
-                        temperature=0.7,
-                        verbose=True
-                    )
+    def test_argument_parser_description(self):
+        """Test that argument parser has correct metadata."""
+        parser = build_parser()
+        assert parser.prog == "deepcast"
+        assert parser.description == "Generate Deepcast Breakdown from diarized transcript"
+        assert parser.epilog == "Example: deepcast transcript.txt"
     
-    def test_main_with_output_path(self):
-        """Test CLI with custom output path."""
-        with patch('sys.argv', ['deepcast', 'transcript.txt', '--output-path', 'custom-output.md']):
-            with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-                with patch('deepcast_post.cli.DeepcastGenerator') as mock_generator_class:
-                    mock_generator = MagicMock()
-                    mock_generator_class.return_value = mock_generator
-                    mock_generator.generate_breakdown.return_value = None
-                    
-                    main()
-                    
-                    # Verify breakdown was generated with custom output path
-                    mock_generator.generate_breakdown.assert_called_once_with(
-                        transcript_path="transcript.txt",
-                        output_path="custom-output.md"
-                    )
+    def test_parser_is_built_once(self):
+        """Test repeated parses reuse the cached parser."""
+        _get_parser.cache_clear()
+        # Negative values are left to argparse by the hand-rolled parser
+        _parse_args(['transcript.txt', '--temperature', '-0.5'])
+        _parse_args(['transcript.txt', '--temperature', '-1'])
+        assert _get_parser.cache_info().misses == 1
     
-    def test_main_generator_exception(self):
-        """Test CLI handles generator exceptions gracefully."""
-        with patch('sys.argv', ['deepcast', 'transcript.txt']):
-            with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-                with patch('deepcast_post.cli.DeepcastGenerator') as mock_generator_class:
-                    mock_generator = MagicMock()
-                    mock_generator.generate_breakdown.side_effect = Exception("Test error")
-                    mock_generator_class.return_value = mock_generator
-                    
-                    with patch('sys.exit') as mock_exit:
-                        with patch('deepcast_post.cli.console.print') as mock_print:
-                            main()
-                            
-                            # Verify error was printed
-                            call_args = mock_print.call_args[0][0]
-                            # Check the panel content by accessing its renderable
-                            panel_content = str(call_args.renderable)
-                            assert "Test error" in panel_content
-                            
-                            # Verify exit code
-                            mock_exit.assert_called_once_with(1)
+    def test_argument_parser_arguments(self, monkeypatch, api_key, mock_generator_class, mock_generator):
+        """Test that all expected arguments are added to parser."""
+        monkeypatch.setattr("sys.argv", ['deepcast', 'transcript.txt'])
+        
+        # Instead of mocking ArgumentParser, let's test the actual argument parsing
+        # by checking that the arguments are properly parsed
+        main()
+        
+        # Verify that the generator was called with the expected arguments
+        mock_generator.generate_breakdown.assert_called_once_with(
+            transcript_path="transcript.txt",
+            output_path=None
+        )
     
-    def test_main_file_not_found_exception(self):
-        """Test CLI handles file not found exceptions."""
-        with patch('sys.argv', ['deepcast', 'transcript.txt']):
-            with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-                with patch('deepcast_post.cli.DeepcastGenerator') as mock_generator_class:
-                    mock_generator = MagicMock()
-                    mock_generator.generate_breakdown.side_effect = FileNotFoundError("File not found")
-                    mock_generator_class.return_value = mock_generator
-                    
-                    with patch('sys.exit') as mock_exit:
-                        with patch('deepcast_post.cli.console.print') as mock_print:
-                            main()
-                            
-                            # Verify error was printed
-                            call_args = mock_print.call_args[0][0]
-                            panel_content = str(call_args.renderable)
-                            assert "File not found" in panel_content
-                            
-                            # Verify exit code
-                            mock_exit.assert_called_once_with(1)
+    @pytest.mark.parametrize("argv", [
+        ['transcript.txt'],
+        ['transcript.txt', '--model', 'gpt-4', '--temperature', '0.5'],
+        ['-v', '--cache', 'transcript.txt', '--output-path', 'out.md'],
+        ['transcript.txt', '--no-cost-warning', '--verbose'],
+    ], ids=["positional_only", "value_options", "flags_before_positional", "flags_after_positional"])
+    def test_parse_args_fast_path_matches_argparse(self, argv):
+        """Test the hand-rolled parser yields the same namespace as argparse."""
+        assert vars(_parse_args(argv)) == vars(build_parser().parse_args(argv))
     
-    def test_main_openai_api_exception(self):
-        """Test CLI handles OpenAI API exceptions."""
-        with patch('sys.argv', ['deepcast', 'transcript.txt']):
-            with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-                with patch('deepcast_post.cli.DeepcastGenerator') as mock_generator_class:
-                    mock_generator = MagicMock()
-                    mock_generator.generate_breakdown.side_effect = Exception("OpenAI API error: Rate limit exceeded")
-                    mock_generator_class.return_value = mock_generator
-                    
-                    with patch('sys.exit') as mock_exit:
-                        with patch('deepcast_post.cli.console.print') as mock_print:
-                            main()
-                            
-                            # Verify error was printed
-                            call_args = mock_print.call_args[0][0]
-                            panel_content = str(call_args.renderable)
-                            assert "Rate limit exceeded" in panel_content
-                            
-                            # Verify exit code
-                            mock_exit.assert_called_once_with(1)
+    @pytest.mark.parametrize("argv", [
+        ['transcript.txt', '--temperature', 'hot'],
+        ['transcript.txt', '--model'],
+        ['transcript.txt', 'extra.txt'],
+        ['transcript.txt', '--unknown'],
+    ], ids=["bad_temperature", "missing_value", "extra_positional", "unknown_option"])
+    def test_parse_args_errors_fall_back_to_argparse(self, argv, capsys):
+        """Test malformed arguments are reported by argparse."""
+        with pytest.raises(SystemExit) as exc_info:
+            _parse_args(argv)
+        assert exc_info.value.code == 2
+        assert "usage: deepcast" in capsys.readouterr().err
     
-    def test_argument_parser_description(self):
-        """Test that argument parser has correct description."""
-        with patch('sys.argv', ['deepcast', '--help']):
-            with patch('sys.exit') as mock_exit:
-                with patch('argparse.ArgumentParser') as mock_parser_class:
-                    mock_parser = MagicMock()
-                    mock_parser_class.return_value = mock_parser
-                    
-                    try:
-                        main()
-                    except SystemExit:
-                        pass
-                    
-                    # Verify parser was created with correct description
-                    mock_parser_class.assert_called_once_with(
-                        prog="deepcast",
-                        description="Generate Deepcast Breakdown from diarized transcript",
-                        epilog="Example: deepcast transcript.txt"
-                    )
+    @pytest.mark.parametrize("argv,expect_handler", [
+        (['deepcast', 'transcript.txt'], False),
+        (['deepcast', 'transcript.txt', '--verbose'], True),
+    ], ids=["quiet", "verbose"])
+    def test_main_shows_progress_only_when_verbose(self, monkeypatch, api_key, mock_generator_class,
+                                                   package_logger, argv, expect_handler):
+        """Test --verbose routes the generator's progress log to the console."""
+        monkeypatch.setattr("sys.argv", argv)
+        handlers = package_logger.handlers[:]
+        
+        main()
+        
+        assert (package_logger.handlers != handlers) is expect_handler
+        assert (package_logger.level == logging.INFO) is expect_handler
     
-    def test_argument_parser_arguments(self):
-        """Test that all expected arguments are added to parser."""
-        with patch('sys.argv', ['deepcast', 'transcript.txt']):
-            with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-                with patch('deepcast_post.cli.DeepcastGenerator') as mock_generator_class:
-                    mock_generator = MagicMock()
-                    mock_generator_class.return_value = mock_generator
-                    mock_generator.generate_breakdown.return_value = None
-                    
-                    # Instead of mocking ArgumentParser, let's test the actual argument parsing
-                    # by checking that the arguments are properly parsed
-                    main()
-                    
-                    # Verify that the generator was called with the expected arguments
-                    mock_generator.generate_breakdown.assert_called_once_with(
-                        transcript_path="transcript.txt",
-                        output_path=None
-                    )
+    def test_print_error_renders_panel(self, mock_console_print):
+        """Test error messages and details are rendered in a titled panel."""
+        _print_error("Something broke", "Generation Failed", "Try again")
+        
+        panel = mock_console_print.call_args[0][0]
+        assert panel.title == "Generation Failed"
+        assert panel.renderable == "[red]Error: Something broke[/red]\nTry again"
+    
+    def test_cost_warning_skipped_when_not_a_tty(self, monkeypatch, mock_console_print):
+        """Test the cost warning is not rendered when stdout is piped."""
+        monkeypatch.setattr("sys.stdout.isatty", lambda: False)
+        show_cost_warning()
+        mock_console_print.assert_not_called()
+    
+    def test_cost_warning_shown_on_tty(self, monkeypatch, mock_console_print):
+        """Test the cost warning is rendered on an interactive terminal."""
+        monkeypatch.setattr("sys.stdout.isatty", lambda: True)
+        show_cost_warning()
+        mock_console_print.assert_called_once()
@@ -1,263 +1,597 @@
 import pytest
+import asyncio
+import logging
 import os
-import tempfile
-from unittest.mock import patch, MagicMock, mock_open
-from deepcast_post.core import DeepcastGenerator
+import re
+import threading
+from unittest.mock import patch, AsyncMock, MagicMock
+from deepcast_post.core import DeepcastGenerator, _chunk_transcript
+
+# Phrases every generated prompt must contain, matched in a single pass
+_PROMPT_SECTIONS = ("thematic breakdown", "Markdown", "Speaker-organized notes",
+                    "Extracted quotes", "executive summary", "NOTION COMPATIBILITY")
+_PROMPT_SECTIONS_RE = re.compile("|".join(map(re.escape, _PROMPT_SECTIONS)))
 
 
 class TestDeepcastGenerator:
-    def test_init_without_api_key(self):
+    def test_init_without_api_key(self, monkeypatch):
         """Test initialization without OpenAI API key raises error."""
-        with patch.dict(os.environ, {}, clear=True):
-            with pytest.raises(ValueError, match="OPENAI_API_KEY environment variable not set"):
-                DeepcastGenerator()
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+        with pytest.raises(ValueError, match="OPENAI_API_KEY environment variable not set"):
+            DeepcastGenerator()
     
-    def test_init_with_api_key(self):
+    def test_init_with_api_key(self, api_key):
         """Test initialization with OpenAI API key."""
-        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-            generator = DeepcastGenerator()
-            assert generator.model == "gpt-4o-mini"
-            assert generator.temperature == 0.7
-            assert generator.verbose is False
+        generator = DeepcastGenerator()
+        assert generator.model == "gpt-4o-mini"
+        assert generator.temperature == 0.7
+        assert generator.verbose is False
     
-    def test_init_with_custom_parameters(self):
+    def test_init_with_custom_parameters(self, api_key):
         """Test initialization with custom model and temperature."""
-        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-            generator = DeepcastGenerator(model="gpt-4", temperature=0.5, verbose=True)
-            assert generator.model == "gpt-4"
-            assert generator.temperature == 0.5
-            assert generator.verbose is True
+        generator = DeepcastGenerator(model="gpt-4", temperature=0.5, verbose=True)
+        assert generator.model == "gpt-4"
+        assert generator.temperature == 0.5
+        assert generator.verbose is True
+    
+    def test_init_with_zero_temperature(self, api_key):
+        """Test an explicit temperature of 0 is kept rather than replaced by the default."""
+        assert DeepcastGenerator(temperature=0).temperature == 0
     
-    def test_init_with_environment_overrides(self):
+    def test_init_with_environment_overrides(self, api_key, monkeypatch):
         """Test initialization with environment variable overrides."""
-        with patch.dict(os.environ, {
-            "OPENAI_API_KEY": "test-key",
-            "OPENAI_MODEL": "gpt-3.5-turbo",
-            "OPENAI_TEMPERATURE": "0.3"
-        }):
-            generator = DeepcastGenerator()
-            assert generator.model == "gpt-3.5-turbo"
-            assert generator.temperature == 0.3
-    
-    def test_load_transcript_file_not_found(self):
+        monkeypatch.setenv("OPENAI_MODEL", "gpt-3.5-turbo")
+        monkeypatch.setenv("OPENAI_TEMPERATURE", "0.3")
+        generator = DeepcastGenerator()
+        assert generator.model == "gpt-3.5-turbo"
+        assert generator.temperature == 0.3
+    
+    def test_load_transcript_file_not_found(self, generator):
         """Test loading transcript from non-existent file."""
-        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-            generator = DeepcastGenerator()
-            with pytest.raises(FileNotFoundError, match="Transcript file not found: non-existent-file.txt"):
-                generator.load_transcript("non-existent-file.txt")
+        with pytest.raises(FileNotFoundError, match="Transcript file not found: non-existent-file.txt"):
+            generator.load_transcript("non-existent-file.txt")
     
-    def test_load_transcript_success(self):
+    def test_load_transcript_success(self, generator, tmp_path):
         """Test loading transcript from existing file."""
-        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-            generator = DeepcastGenerator()
-            
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
-                f.write("Test transcript content")
-                temp_file = f.name
-            
-            try:
-                content = generator.load_transcript(temp_file)
-                assert content == "Test transcript content"
-            finally:
-                os.unlink(temp_file)
+        transcript_file = tmp_path / "transcript.txt"
+        transcript_file.write_text("Test transcript content")
+        
+        content = generator.load_transcript(str(transcript_file))
+        assert content == "Test transcript content"
     
-    def test_load_transcript_encoding_error(self):
+    def test_load_transcript_collapses_whitespace(self, generator, tmp_path):
+        """Test redundant spaces, tabs and blank lines are removed from transcripts."""
+        transcript_file = tmp_path / "transcript.txt"
+        transcript_file.write_text(
+            "\n[00:00:00] Speaker A:   Hello\t there.  \n\n\n[00:00:05] Speaker B: Hi.\n  \n"
+        )
+        
+        content = generator.load_transcript(str(transcript_file))
+        assert content == "[00:00:00] Speaker A: Hello there.\n[00:00:05] Speaker B: Hi."
+    
+    @pytest.mark.parametrize("raw,expected", [
+        (b"", ""),
+        (b"[00:00:00] Speaker A: Hello.\r\n[00:00:05] Speaker B: Hi.\r\n",
+         "[00:00:00] Speaker A: Hello.\n[00:00:05] Speaker B: Hi."),
+        ("[00:00:00] Speaker A: Caf\u00e9 \u2014 na\u00efve.".encode("utf-8"),
+         "[00:00:00] Speaker A: Caf\u00e9 \u2014 na\u00efve."),
+    ], ids=["empty", "crlf_line_endings", "non_ascii"])
+    def test_load_transcript_decodes_bytes(self, generator, tmp_path, raw, expected):
+        """Test transcripts are decoded as UTF-8 with text-mode line endings."""
+        transcript_file = tmp_path / "transcript.txt"
+        transcript_file.write_bytes(raw)
+        
+        assert generator.load_transcript(str(transcript_file)) == expected
+    
+    @pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="needs named pipes")
+    def test_load_transcript_from_fifo(self, generator, tmp_path):
+        """Test transcripts piped through a FIFO are read in full rather than mapped."""
+        fifo = tmp_path / "transcript.fifo"
+        os.mkfifo(fifo)
+        
+        def feed():
+            with open(fifo, "wb") as f:
+                f.write(b"[00:00:00] Speaker A: Piped in.\n")
+        
+        writer = threading.Thread(target=feed)
+        writer.start()
+        try:
+            assert generator.load_transcript(str(fifo)) == "[00:00:00] Speaker A: Piped in."
+        finally:
+            writer.join()
+    
+    def test_load_transcript_invalid_utf8(self, generator, tmp_path):
+        """Test invalid UTF-8 is reported rather than silently replaced."""
+        transcript_file = tmp_path / "transcript.txt"
+        transcript_file.write_bytes(b"Speaker A: \xff\xfe")
+        
+        with pytest.raises(Exception, match="Error reading transcript file:"):
+            generator.load_transcript(str(transcript_file))
+    
+    def test_load_transcript_encoding_error(self, generator, monkeypatch):
         """Test loading transcript with encoding issues."""
-        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-            generator = DeepcastGenerator()
-            
-            # Mock open to raise an encoding error
-            with patch('builtins.open', mock_open()) as mock_file:
-                mock_file.side_effect = UnicodeDecodeError('utf-8', b'', 0, 1, 'Invalid byte')
-                
-                with pytest.raises(Exception, match="Error reading transcript file:"):
-                    generator.load_transcript("test.txt")
-    
-    def test_build_prompt(self):
+        def raise_decode_error(*args, **kwargs):
+            raise UnicodeDecodeError('utf-8', b'', 0, 1, 'Invalid byte')
+        
+        monkeypatch.setattr("builtins.open", raise_decode_error)
+        with pytest.raises(Exception, match="Error reading transcript file:"):
+            generator.load_transcript("test.txt")
+    
+    @pytest.mark.parametrize("transcript", [
+        "Test transcript",
+        pytest.param("A" * 1000, marks=pytest.mark.slow),  # Long transcript
+    ], ids=["short_transcript", "long_transcript"])
+    def test_build_prompt(self, generator, transcript):
         """Test prompt building."""
-        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-            generator = DeepcastGenerator()
-            transcript = "Test transcript"
-            prompt = generator.build_prompt(transcript)
-            
-            assert "Test transcript" in prompt
-            assert "thematic breakdown" in prompt
-            assert "Markdown" in prompt
-            assert "Speaker-organized notes" in prompt
-            assert "Extracted quotes" in prompt
-            assert "executive summary" in prompt
-            assert "NOTION COMPATIBILITY" in prompt
-    
-    def test_build_prompt_with_long_transcript(self):
-        """Test prompt building with longer transcript content."""
-        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-            generator = DeepcastGenerator()
-            transcript = "A" * 1000  # Long transcript
-            prompt = generator.build_prompt(transcript)
-            
-            assert len(prompt) > 1000
-            assert transcript in prompt
+        prompt = generator.build_prompt(transcript)
+        
+        assert transcript in prompt
+        assert set(_PROMPT_SECTIONS_RE.findall(prompt)) == set(_PROMPT_SECTIONS)
     
-    @patch('openai.OpenAI')
-    def test_get_deepcast_breakdown_success(self, mock_openai):
+    @patch('deepcast_post.core._encoding', return_value=None)
+    def test_estimate_tokens_without_tiktoken(self, mock_encoding, generator):
+        """Test token estimation falls back to ~4 characters per token."""
+        assert generator.estimate_tokens("") == 0
+        assert generator.estimate_tokens("a" * 400) == 100
+    
+    @patch('deepcast_post.core._encoding')
+    def test_estimate_tokens_with_tiktoken(self, mock_encoding, api_key):
+        """Test token counting uses the model's tiktoken encoding when available."""
+        mock_encoding.return_value.encode.return_value = [1, 2, 3]
+        generator = DeepcastGenerator(model="gpt-4o")
+        
+        assert generator.estimate_tokens("Hello there world") == 3
+        mock_encoding.assert_called_with("gpt-4o")
+        mock_encoding.return_value.encode.assert_called_once_with("Hello there world", disallowed_special=())
+    
+    @pytest.mark.parametrize("model,max_tokens,expected", [
+        ("gpt-4o-mini", 8000, 50000),
+        ("gpt-4", 1000, 8192 - 1000 - 1024),
+        ("gpt-4-1106-preview", 8000, 50000),
+        ("gpt-4-0125-preview", 8000, 50000),
+        ("gpt-4.5-preview", 8000, 50000),
+        ("my-finetuned-model", 8000, 50000),
+    ], ids=["large_window", "small_window", "gpt_4_1106_preview", "gpt_4_0125_preview", "gpt_4_5_preview",
+            "unknown_model"])
+    def test_max_input_tokens_fits_context_window(self, api_key, model, max_tokens, expected):
+        """Test the input limit leaves room for the prompt and output in the model's context window."""
+        generator = DeepcastGenerator(model=model, max_tokens=max_tokens)
+        assert generator.max_input_tokens == expected
+        assert generator.max_tokens == max_tokens
+    
+    def test_max_tokens_clamped_when_window_too_small(self, api_key):
+        """Test output tokens are clamped so a small window still leaves room for the transcript."""
+        generator = DeepcastGenerator(model="gpt-4", max_tokens=8000)
+        
+        assert generator.max_tokens == (8192 - 1024) // 2
+        assert generator.max_input_tokens == 8192 - 1024 - generator.max_tokens
+        assert len(_chunk_transcript("[00:00:00] Speaker A: Hi.\n" * 50, generator.max_input_tokens)) == 1
+    
+    @pytest.mark.parametrize("transcript", [
+        "Спикер А: " + "слово " * 60,
+        "Speaker A: " + "word " * 10 + " " * 200 + "\n" * 200,
+    ], ids=["non_ascii", "whitespace_padded"])
+    def test_transcript_size_checked_after_loading(self, tmp_path, api_key, monkeypatch, mock_openai_client,
+                                                    transcript):
+        """Test transcripts are accepted by their loaded token count, not their size in bytes."""
+        monkeypatch.setenv("OPENAI_MAX_INPUT_TOKENS", "100")
+        generator = DeepcastGenerator(model="unknown-model")
+        transcript_file = tmp_path / "transcript.txt"
+        transcript_file.write_text(transcript, encoding="utf-8")
+        assert transcript_file.stat().st_size / 4 > generator.max_input_tokens
+        
+        with patch.object(generator, 'estimate_tokens', side_effect=lambda text: len(text) >> 2):
+            generator.generate_breakdown(str(transcript_file), str(tmp_path / "out.md"))
+        
+        assert (tmp_path / "out.md").exists()
+    
+    def test_chunk_transcript_splits_at_timestamps(self):
+        """Test long transcripts are split at timestamp lines within the token budget."""
+        lines = [f"[00:00:{i:02d}] Speaker A: {'x' * 30}\n" for i in range(10)]
+        transcript = "".join(lines)
+        
+        chunks = [chunk for chunk, _ in _chunk_transcript(transcript, max_tokens=30)]  # ~120 characters, two lines
+        
+        assert "".join(chunks) == transcript
+        assert len(chunks) == 5
+        assert all(chunk.startswith("[") for chunk in chunks)
+        assert all(len(chunk) <= 120 for chunk in chunks)
+    
+    def test_chunk_transcript_keeps_oversized_word(self):
+        """Test a single word larger than the budget becomes its own chunk."""
+        transcript = "[00:00:00] A: short\n[00:00:01] B: " + "y" * 500 + "\n[00:00:02] A: end"
+        
+        chunks = _chunk_transcript(transcript, max_tokens=10)
+        
+        assert "".join(chunk for chunk, _ in chunks) == transcript
+        assert chunks[1] == ("y" * 500 + "\n", 125)
+        assert len(chunks) == 3
+    
+    @pytest.mark.parametrize("transcript", [
+        "[00:00:00] Speaker A: " + "One sentence here. " * 20 + "\n[00:00:01] Speaker B: Short.",
+        "Speaker A: " + "word " * 100,
+    ], ids=["sentences", "words"])
+    def test_chunk_transcript_splits_oversized_segment(self, transcript):
+        """Test a segment over the budget is split again at sentence or word boundaries."""
+        chunks = _chunk_transcript(transcript, max_tokens=30)
+        
+        assert "".join(chunk for chunk, _ in chunks) == transcript
+        assert len(chunks) > 1
+        assert all(0 < tokens <= 30 for _, tokens in chunks)
+    
+    @pytest.mark.parametrize("lines", [
+        [f"Speaker {'AB'[i % 2]}: {'x' * 30}\n" for i in range(10)],
+        [f"{'x' * 40}\n" for i in range(10)],
+    ], ids=["speaker_lines", "plain_lines"])
+    def test_chunk_transcript_without_timestamps(self, lines):
+        """Test transcripts without timestamps are split at speaker or plain lines."""
+        transcript = "".join(lines)
+        
+        chunks = [chunk for chunk, _ in _chunk_transcript(transcript, max_tokens=30)]  # ~10 tokens per line
+        
+        assert "".join(chunks) == transcript
+        assert [chunk.count("\n") for chunk in chunks] == [3, 3, 3, 1]
+    
+    def test_chunk_transcript_counts_tokens_per_segment(self):
+        """Test chunk budgets use the given token counter."""
+        transcript = "".join(f"[00:00:{i:02d}] Speaker A: hi\n" for i in range(6))
+        
+        chunks = _chunk_transcript(transcript, max_tokens=3, count_tokens=lambda segment: 1)
+        
+        assert [tokens for _, tokens in chunks] == [3, 3]
+    
+    def test_get_deepcast_breakdown_success(self, mock_openai_client, api_key):
         """Test successful API call to OpenAI."""
-        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-            generator = DeepcastGenerator()
-            
-            # Mock the OpenAI response
-            mock_client = MagicMock()
-            mock_response = MagicMock()
-            mock_response.choices[0].message.content = "Generated deepcast breakdown"
-            mock_client.chat.completions.create.return_value = mock_response
-            mock_openai.return_value = mock_client
-            
-            result = generator.get_deepcast_breakdown("Test prompt")
-            
-            assert result == "Generated deepcast breakdown"
-            mock_client.chat.completions.create.assert_called_once()
+        generator = DeepcastGenerator()
+        
+        result = generator.get_deepcast_breakdown("Test prompt")
+        
+        assert result == "# Generated Deepcast\n\nContent here"
+        mock_openai_client.chat.completions.create.assert_called_once()
     
-    @patch('openai.OpenAI')
-    def test_get_deepcast_breakdown_api_error(self, mock_openai):
+    def test_get_deepcast_breakdown_api_error(self, mock_openai_client, api_key):
         """Test OpenAI API error handling."""
-        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-            generator = DeepcastGenerator()
-            
-            # Mock the OpenAI client to raise an error
-            mock_client = MagicMock()
-            mock_client.chat.completions.create.side_effect = Exception("API rate limit exceeded")
-            mock_openai.return_value = mock_client
-            
-            with pytest.raises(Exception, match="OpenAI API error: API rate limit exceeded"):
-                generator.get_deepcast_breakdown("Test prompt")
+        generator = DeepcastGenerator()
+        
+        # Mock the OpenAI client to raise an error
+        mock_openai_client.chat.completions.create.side_effect = Exception("API rate limit exceeded")
+        
+        with pytest.raises(Exception, match="OpenAI API error: API rate limit exceeded"):
+            generator.get_deepcast_breakdown("Test prompt")
     
-    @patch('openai.OpenAI')
-    def test_get_deepcast_breakdown_correct_parameters(self, mock_openai):
+    def test_get_deepcast_breakdown_correct_parameters(self, mock_openai_client, api_key):
         """Test that OpenAI API is called with correct parameters."""
-        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-            generator = DeepcastGenerator(model="gpt-4", temperature=0.5)
-            
-            mock_client = MagicMock()
-            mock_response = MagicMock()
-            mock_response.choices[0].message.content = "Test response"
-            mock_client.chat.completions.create.return_value = mock_response
-            mock_openai.return_value = mock_client
-            
-            generator.get_deepcast_breakdown("Test prompt")
-            
-            # Verify the API call parameters
-            call_args = mock_client.chat.completions.create.call_args
-            assert call_args[1]['model'] == "gpt-4"
-            assert call_args[1]['temperature'] == 0.5
-            assert call_args[1]['messages'][0]['role'] == "system"
-            assert call_args[1]['messages'][1]['role'] == "user"
-            assert call_args[1]['messages'][1]['content'] == "Test prompt"
-    
-    @patch('deepcast_post.core.Progress')
-    @patch('deepcast_post.core.DeepcastGenerator.get_deepcast_breakdown')
+        generator = DeepcastGenerator(model="gpt-4", temperature=0.5)
+        
+        generator.get_deepcast_breakdown("Test prompt")
+        
+        # Verify the API call parameters
+        call_args = mock_openai_client.chat.completions.create.call_args
+        assert call_args[1]['model'] == "gpt-4"
+        assert call_args[1]['temperature'] == 0.5
+        assert call_args[1]['messages'][0]['role'] == "system"
+        assert call_args[1]['messages'][1]['role'] == "user"
+        assert call_args[1]['messages'][1]['content'] == "Test prompt"
+    
+    @patch('openai.OpenAI')
+    def test_get_deepcast_breakdown_reuses_client(self, mock_openai, api_key):
+        """Test that repeated API calls share one OpenAI client."""
+        generator = DeepcastGenerator()
+        
+        generator.get_deepcast_breakdown("First prompt")
+        generator.get_deepcast_breakdown("Second prompt")
+        
+        mock_openai.assert_called_once()
+        assert mock_openai.return_value.chat.completions.create.call_count == 2
+    
+    @patch('openai.OpenAI')
+    def test_client_not_created_until_api_call(self, mock_openai, api_key, tmp_path):
+        """Test that loading and prompt building never construct an OpenAI client."""
+        generator = DeepcastGenerator()
+        transcript_file = tmp_path / "transcript.txt"
+        transcript_file.write_text("Test transcript content")
+        
+        generator.build_prompt(generator.load_transcript(str(transcript_file)))
+        
+        mock_openai.assert_not_called()
+        assert "_client" not in vars(generator)
+    
+    @patch('openai.OpenAI')
+    def test_injected_client_used_instead_of_openai(self, mock_openai, monkeypatch, stream_response):
+        """Test an injected client serves requests without an API key or an openai.OpenAI client."""
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+        client = MagicMock()
+        client.chat.completions.create.return_value = stream_response("# Injected Deepcast")
+        generator = DeepcastGenerator(client=client)
+        
+        assert "".join(generator.stream_deepcast_breakdown("Test prompt")) == "# Injected Deepcast"
+        client.chat.completions.create.assert_called_once()
+        mock_openai.assert_not_called()
+    
+    @patch('openai.AsyncOpenAI')
+    def test_injected_client_without_key_rejects_async_paths(self, mock_async_openai, monkeypatch, tmp_path):
+        """Test batch generation without an API key or async client fails clearly before any request."""
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+        transcript_file = tmp_path / "episode.txt"
+        transcript_file.write_text("[00:00:00] Speaker A: Hello")
+        generator = DeepcastGenerator(client=MagicMock())
+        
+        with pytest.raises(ValueError, match="OPENAI_API_KEY environment variable not set"):
+            generator.generate_batch([str(transcript_file)], [str(tmp_path / "episode.md")])
+        mock_async_openai.assert_not_called()
+    
+    @patch('openai.AsyncOpenAI')
+    def test_injected_async_client_used_for_batch(self, mock_async_openai, monkeypatch, tmp_path):
+        """Test an injected async client serves batch requests and is left open for its owner."""
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+        transcript_file = tmp_path / "episode.txt"
+        transcript_file.write_text("[00:00:00] Speaker A: Hello")
+        async_client = MagicMock()
+        async_client.chat.completions.create = AsyncMock()
+        async_client.chat.completions.create.return_value.choices[0].message.content = "# Injected Deepcast"
+        async_client.close = AsyncMock()
+        generator = DeepcastGenerator(async_client=async_client)
+        
+        results = generator.generate_batch([str(transcript_file)], [str(tmp_path / "episode.md")])
+        
+        assert results == [str(tmp_path / "episode.md")]
+        assert (tmp_path / "episode.md").read_text() == "# Injected Deepcast"
+        async_client.close.assert_not_awaited()
+        mock_async_openai.assert_not_called()
+    
+    @patch('openai.OpenAI')
+    def test_client_shared_between_generators(self, mock_openai, api_key):
+        """Test generators with the same API key reuse one OpenAI client."""
+        DeepcastGenerator().get_deepcast_breakdown("Test prompt")
+        DeepcastGenerator(model="gpt-4").get_deepcast_breakdown("Test prompt")
+        
+        mock_openai.assert_called_once()
+        assert mock_openai.return_value.chat.completions.create.call_count == 2
+    
+    @patch('openai.DefaultHttpxClient')
+    @patch('openai.OpenAI')
+    def test_client_uses_http2_when_available(self, mock_openai, mock_http_client, api_key):
+        """Test the OpenAI client gets an HTTP/2 transport when h2 is installed."""
+        with patch('importlib.util.find_spec', return_value=MagicMock()):
+            DeepcastGenerator().get_deepcast_breakdown("Test prompt")
+        
+        assert mock_http_client.call_args[1]['http2'] is True
+        mock_openai.assert_called_once_with(api_key="test-key", max_retries=5,
+                                            http_client=mock_http_client.return_value)
+    
+    @patch('openai.AsyncOpenAI')
+    @patch('openai.OpenAI')
+    def test_clients_retry_rate_limited_requests(self, mock_openai, mock_async_openai, api_key):
+        """Test both OpenAI clients are configured to retry rate-limited requests."""
+        mock_async_openai.return_value.close = AsyncMock()
+        generator = DeepcastGenerator()
+        
+        generator.get_deepcast_breakdown("Test prompt")
+        asyncio.run(generator._with_async_client(AsyncMock()))
+        
+        assert mock_openai.call_args[1]['max_retries'] == 5
+        assert mock_async_openai.call_args[1]['max_retries'] == 5
+    
+    @patch('openai.OpenAI')
+    def test_get_deepcast_breakdown_cache_hit(self, mock_openai, tmp_path, api_key, monkeypatch):
+        """Test that cached responses are reused for identical requests."""
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+        mock_openai.return_value.chat.completions.create.return_value.choices[0].message.content = "Cached breakdown"
+        
+        first = DeepcastGenerator(cache=True).get_deepcast_breakdown("Test prompt")
+        second = DeepcastGenerator(cache=True).get_deepcast_breakdown("Test prompt")
+        
+        assert first == second == "Cached breakdown"
+        assert mock_openai.return_value.chat.completions.create.call_count == 1
+        assert len(list((tmp_path / "deepcast" / "responses").glob("*.md"))) == 1
+        
+        # A different temperature is a different request
+        DeepcastGenerator(temperature=0.2, cache=True).get_deepcast_breakdown("Test prompt")
+        assert mock_openai.return_value.chat.completions.create.call_count == 2
+    
+    @patch('openai.OpenAI')
+    def test_stream_deepcast_breakdown_yields_pieces(self, mock_openai, api_key, stream_response):
+        """Test streamed responses are yielded piece by piece, skipping empty deltas."""
+        chunks = stream_response("# Generated Deepcast!", pieces=2)
+        empty = MagicMock()
+        empty.choices = []
+        mock_openai.return_value.chat.completions.create.return_value = chunks + [empty]
+        
+        pieces = list(DeepcastGenerator().stream_deepcast_breakdown("Test prompt"))
+        
+        assert pieces == ["# Generated", " Deepcast!"]
+        assert mock_openai.return_value.chat.completions.create.call_args[1]['stream'] is True
+    
+    @patch('openai.OpenAI')
+    def test_stream_deepcast_breakdown_caches_full_response(self, mock_openai, tmp_path, api_key,
+                                                            monkeypatch, stream_response):
+        """Test a streamed response is cached whole and replayed without an API call."""
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+        mock_openai.return_value.chat.completions.create.return_value = stream_response("# Generated Deepcast")
+        
+        first = "".join(DeepcastGenerator(cache=True).stream_deepcast_breakdown("Test prompt"))
+        second = list(DeepcastGenerator(cache=True).stream_deepcast_breakdown("Test prompt"))
+        
+        assert second == [first] == ["# Generated Deepcast"]
+        assert mock_openai.return_value.chat.completions.create.call_count == 1
+    
+    @patch('openai.OpenAI')
+    def test_generate_breakdown_semantic_cache_hit(self, mock_openai, tmp_path, api_key, monkeypatch, stream_response):
+        """Test a near-duplicate transcript reuses the earlier breakdown."""
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        mock_client = mock_openai.return_value
+        mock_client.embeddings.create.return_value.data[0].embedding = [0.1, 0.2, 0.3]
+        mock_client.chat.completions.create.return_value = stream_response("# Breakdown")
+        
+        for name, text in (("original", "[00:00:00] Speaker A: Hello there."),
+                           ("edited", "[00:00:00] Speaker A: Hello there!")):
+            transcript_file = tmp_path / f"{name}.txt"
+            transcript_file.write_text(text)
+            output_file = tmp_path / f"{name}.md"
+            DeepcastGenerator(semantic_cache=True).generate_breakdown(str(transcript_file), str(output_file))
+            assert output_file.read_text() == "# Breakdown"
+        
+        assert mock_client.embeddings.create.call_count == 2
+        assert mock_client.chat.completions.create.call_count == 1
+    
+    @patch('openai.OpenAI')
+    def test_generate_breakdown_exact_cache_hit_skips_embedding(self, mock_openai, tmp_path, api_key, monkeypatch,
+                                                                stream_response):
+        """Test re-running an identical transcript is served by the exact cache without an embedding request."""
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        mock_client = mock_openai.return_value
+        mock_client.embeddings.create.return_value.data[0].embedding = [0.1, 0.2, 0.3]
+        mock_client.chat.completions.create.return_value = stream_response("# Breakdown")
+        transcript_file = tmp_path / "transcript.txt"
+        transcript_file.write_text("[00:00:00] Speaker A: Hello there.")
+        
+        for run in range(3):
+            output_file = tmp_path / f"{run}.md"
+            generator = DeepcastGenerator(cache=True, semantic_cache=True)
+            generator.generate_breakdown(str(transcript_file), str(output_file))
+            assert output_file.read_text() == "# Breakdown"
+        
+        assert mock_client.embeddings.create.call_count == 1
+        assert mock_client.chat.completions.create.call_count == 1
+    
+    @pytest.mark.slow
+    @patch('deepcast_post.core.DeepcastGenerator.stream_deepcast_breakdown')
     @patch('deepcast_post.core.DeepcastGenerator.load_transcript')
-    def test_generate_breakdown_success(self, mock_load, mock_get_breakdown, mock_progress):
+    def test_generate_breakdown_success(self, mock_load, mock_get_breakdown, api_key, tmp_path):
         """Test successful breakdown generation workflow."""
-        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-            generator = DeepcastGenerator(verbose=True)
-            
-            # Mock dependencies
-            mock_load.return_value = "Test transcript content"
-            mock_get_breakdown.return_value = "# Generated Breakdown\n\nContent here"
-            
-            # Mock progress bar
-            mock_progress_instance = MagicMock()
-            mock_progress.return_value.__enter__.return_value = mock_progress_instance
-            mock_progress_instance.add_task.return_value = "task_id"
-            
-            # Mock file writing
-            with patch('builtins.open', mock_open()) as mock_file:
-                result = generator.generate_breakdown("input.txt", "output.md")
-                
-                # Verify transcript was loaded
-                mock_load.assert_called_once_with("input.txt")
-                
-                # Verify breakdown was generated
-                mock_get_breakdown.assert_called_once()
-                
-                # Verify file was written
-                mock_file.assert_called_once_with("output.md", "w", encoding="utf-8")
+        generator = DeepcastGenerator(verbose=True)
+        output_file = tmp_path / "output.md"
+        
+        # Mock dependencies
+        mock_load.return_value = "Test transcript content"
+        mock_get_breakdown.return_value = iter(["# Generated Breakdown", "\n\nContent here"])
+        
+        generator.generate_breakdown("input.txt", str(output_file))
+        
+        # Verify transcript was loaded
+        mock_load.assert_called_once_with("input.txt")
+        
+        # Verify breakdown was generated
+        mock_get_breakdown.assert_called_once()
+        
+        # Verify file was written, with no temporary file left behind
+        assert output_file.read_text() == "# Generated Breakdown\n\nContent here"
+        assert [p.name for p in tmp_path.iterdir()] == ["output.md"]
     
     @patch('deepcast_post.core.DeepcastGenerator.load_transcript')
-    def test_generate_breakdown_default_output_path(self, mock_load):
+    def test_generate_breakdown_default_output_path(self, mock_load, api_key, tmp_path, monkeypatch):
         """Test that default output path is generated correctly."""
-        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-            generator = DeepcastGenerator()
-            
-            # Mock transcript loading
-            mock_load.return_value = "Test content"
-            
-            # Mock OpenAI API call
-            with patch.object(generator, 'get_deepcast_breakdown', return_value="Generated content"):
-                # Mock file writing
-                with patch('builtins.open', mock_open()) as mock_file:
-                    generator.generate_breakdown("my-transcript.txt")
-                    
-                    # Should generate default output path
-                    expected_path = "my-transcript-deepcast.md"
-                    mock_file.assert_called_once_with(expected_path, "w", encoding="utf-8")
+        monkeypatch.chdir(tmp_path)
+        generator = DeepcastGenerator()
+        
+        # Mock transcript loading
+        mock_load.return_value = "Test content"
+        
+        # Mock OpenAI API call
+        with patch.object(generator, 'stream_deepcast_breakdown', return_value="Generated content"):
+            generator.generate_breakdown("my-transcript.txt")
+        
+        # Should generate default output path
+        assert (tmp_path / "my-transcript-deepcast.md").read_text() == "Generated content"
     
+    @pytest.mark.slow
     @patch('deepcast_post.core.DeepcastGenerator.load_transcript')
-    def test_generate_breakdown_file_write_error(self, mock_load):
+    def test_generate_breakdown_file_write_error(self, mock_load, api_key, tmp_path):
         """Test handling of file write errors."""
-        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-            generator = DeepcastGenerator()
-            
-            # Mock transcript loading
-            mock_load.return_value = "Test content"
-            
-            # Mock OpenAI API call
-            with patch.object(generator, 'get_deepcast_breakdown', return_value="Generated content"):
-                # Mock file writing to raise an error
-                with patch('builtins.open', mock_open()) as mock_file:
-                    mock_file.side_effect = PermissionError("Permission denied")
-                    
-                    with pytest.raises(Exception, match="Error writing output file: Permission denied"):
-                        generator.generate_breakdown("input.txt", "output.md")
-    
-    def test_generate_breakdown_with_verbose_output(self):
-        """Test that verbose mode shows progress messages."""
-        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-            generator = DeepcastGenerator(verbose=True)
+        generator = DeepcastGenerator()
+        
+        # Mock transcript loading
+        mock_load.return_value = "Test content"
+        
+        # Mock OpenAI API call
+        with patch.object(generator, 'stream_deepcast_breakdown', return_value="Generated content"):
+            # Mock the final rename to raise an error
+            with patch('os.replace', side_effect=PermissionError("Permission denied")):
+                with pytest.raises(Exception, match="Error writing output file: Permission denied"):
+                    generator.generate_breakdown("input.txt", str(tmp_path / "output.md"))
+        
+        assert list(tmp_path.iterdir()) == []
+    
+    def test_write_output_concurrent_writers(self, tmp_path):
+        """Test concurrent writes to one output path use separate .part files."""
+        output_path = tmp_path / "ep-deepcast.md"
+        both_writing = threading.Barrier(2, timeout=5)
+        
+        def pieces(text):
+            yield text
+            both_writing.wait()  # Both .part files are open at this point
+            yield "\n"
+        
+        writers = [
+            threading.Thread(target=DeepcastGenerator._write_output, args=(str(output_path), pieces(text)))
+            for text in ("# First", "# Second")
+        ]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+        
+        assert output_path.read_text() in ("# First\n", "# Second\n")
+        assert [p.name for p in tmp_path.iterdir()] == ["ep-deepcast.md"]
+    
+    @pytest.mark.skipif(os.name != "posix", reason="POSIX permissions")
+    def test_write_output_permissions(self, tmp_path):
+        """Test new outputs get the umask's permissions and replaced outputs keep theirs."""
+        output_path = tmp_path / "output.md"
+        umask = os.umask(0o027)
+        try:
+            DeepcastGenerator._write_output(str(output_path), "# Generated")
+            assert output_path.stat().st_mode & 0o777 == 0o640
             
-            # Mock all dependencies
-            with patch.object(generator, 'load_transcript', return_value="Test content"):
-                with patch.object(generator, 'get_deepcast_breakdown', return_value="Generated content"):
-                    with patch.object(generator.console, 'print') as mock_print:
-                        with patch('builtins.open', mock_open()):
-                            generator.generate_breakdown("input.txt")
-                            
-                            # Should print verbose messages
-                            assert mock_print.call_count >= 1
-    
-    def test_generate_breakdown_without_verbose_output(self):
+            output_path.chmod(0o604)
+            DeepcastGenerator._write_output(str(output_path), "# Regenerated")
+            assert output_path.stat().st_mode & 0o777 == 0o604
+        finally:
+            os.umask(umask)
+    
+    def test_generate_breakdown_with_verbose_output(self, api_key, caplog):
+        """Test that verbose mode logs progress messages."""
+        caplog.set_level(logging.INFO, logger="deepcast_post")
+        generator = DeepcastGenerator(verbose=True)
+        
+        # Mock all dependencies
+        with patch.object(generator, 'load_transcript', return_value="Test content"):
+            with patch.object(generator, 'stream_deepcast_breakdown', return_value="Generated content"):
+                with patch.object(generator, '_write_output'):
+                    generator.generate_breakdown("input.txt")
+        
+        assert "Loading transcript from: input.txt" in caplog.text
+        assert "Sending to OpenAI" in caplog.text
+    
+    def test_generate_breakdown_without_verbose_output(self, api_key, caplog):
         """Test that non-verbose mode doesn't show progress messages."""
-        with patch.dict(os.environ, {"OPENAI_API_KEY": "test-key"}):
-            generator = DeepcastGenerator(verbose=False)
-            
-            # Mock all dependencies
-            with patch.object(generator, 'load_transcript', return_value="Test content"):
-                with patch.object(generator, 'get_deepcast_breakdown', return_value="Generated content"):
-                    with patch.object(generator.console, 'print') as mock_print:
-                        with patch('builtins.open', mock_open()):
-                            generator.generate_breakdown("input.txt")
-                            
-                            # In non-verbose mode, we should only see:
-                            # 1. Progress bar output (from Rich Progress)
-                            # 2. Success panel
-                            # The verbose messages (loading transcript, sending to OpenAI) should not appear
-                            assert mock_print.call_count == 2  # Progress + success panel
-                            
-                            # Verify that verbose messages were not printed
-                            # Check that no verbose messages appear in the calls
-                            for call in mock_print.call_args_list:
-                                args = call[0]  # Get the positional arguments
-                                if args:  # If there are arguments
-                                    message = str(args[0])
-                                    # These verbose messages should not appear
-                                    assert "📖 Loading transcript from:" not in message
-                                    assert "📡 Sending to OpenAI" not in message 
\ No newline at end of file
+        caplog.set_level(logging.INFO, logger="deepcast_post")
+        # A verbose generator must not make later ones verbose
+        DeepcastGenerator(verbose=True)
+        generator = DeepcastGenerator(verbose=False)
+        
+        # Mock all dependencies
+        with patch.object(generator, 'load_transcript', return_value="Test content"):
+            with patch.object(generator, 'stream_deepcast_breakdown', return_value="Generated content"):
+                with patch.object(generator.console, 'print') as mock_print:
+                    with patch.object(generator, '_write_output'):
+                        generator.generate_breakdown("input.txt")
+                        
+                        # In non-verbose mode, we should only see:
+                        # 1. Generating status line
+                        # 2. Success panel
+                        # The verbose messages (loading transcript, sending to OpenAI) should not appear
+                        assert mock_print.call_count == 2  # Status + success panel
+                        
+                        # Verify that verbose messages were not printed
+                        # Check that no verbose messages appear in the calls
+                        for call in mock_print.call_args_list:
+                            args = call[0]  # Get the positional arguments
+                            if args:  # If there are arguments
+                                message = str(args[0])
+                                # These verbose messages should not appear
+                                assert "📖 Loading transcript from:" not in message
+                                assert "📡 Sending to OpenAI" not in message 
+        
+        # Nor logged
+        assert caplog.text == ""
@@ -1,189 +1,377 @@
+import asyncio
 import pytest
+import logging
 import os
-import tempfile
-from unittest.mock import patch, mock_open
+import re
+import threading
+from pathlib import Path
+from unittest.mock import patch
 from deepcast_post.core import DeepcastGenerator
 
+# Breakdown with every section the prompt asks for, in the expected Markdown style
+_STRUCTURED_BREAKDOWN = """# Deepcast Breakdown
+
+## Main Themes
+- **Theme 1:** Description
+- **Theme 2:** Description
+
+## Speaker Notes
+**Speaker A:** Description
+**Speaker B:** Description
+
+## Executive Summary
+- Point 1
+- Point 2"""
+# Phrases showing that structure survived into the output file
+_STRUCTURED_SECTIONS = ("## Main Themes", "## Speaker Notes", "## Executive Summary",
+                        "**Speaker A:**", "- **Theme 1:**", "- Point 1")
+
 
 class TestIntegration:
     """Integration tests for the complete deepcast generation workflow."""
     
     @pytest.mark.integration
-    def test_full_workflow_success(self, sample_transcript_file, mock_environment, temp_output_dir):
+    @pytest.mark.parametrize("generator_kwargs,response,expected_request,expected_content", [
+        (
+            {},
+            None,
+            {"model": "gpt-4o-mini", "temperature": 0.7},
+            ("# Generated Deepcast",),
+        ),
+        (
+            {"model": "gpt-4", "temperature": 0.3},
+            None,
+            {"model": "gpt-4", "temperature": 0.3},
+            ("# Generated Deepcast",),
+        ),
+        (
+            {},
+            _STRUCTURED_BREAKDOWN,
+            {"model": "gpt-4o-mini", "temperature": 0.7},
+            _STRUCTURED_SECTIONS,
+        ),
+    ], ids=["default_settings", "custom_model_and_temperature", "output_format"])
+    def test_full_workflow(self, sample_transcript_file, mock_environment, mock_openai_client, stream_response,
+                           tmp_path, generator_kwargs, response, expected_request, expected_content):
         """Test the complete workflow from transcript to output file."""
-        output_path = os.path.join(temp_output_dir, "output-deepcast.md")
-        
-        with patch('openai.OpenAI') as mock_openai:
-            # Mock OpenAI response
-            mock_client = mock_openai.return_value
-            mock_response = mock_client.chat.completions.create.return_value
-            mock_response.choices[0].message.content = "# Generated Deepcast\n\nContent here"
-            
-            # Run the full workflow
-            generator = DeepcastGenerator(verbose=False)
-            generator.generate_breakdown(sample_transcript_file, output_path)
-            
-            # Verify OpenAI was called
-            mock_client.chat.completions.create.assert_called_once()
-            
-            # Verify output file was created
-            assert os.path.exists(output_path)
-            
-            # Verify file content
-            with open(output_path, 'r') as f:
-                content = f.read()
-                assert "# Generated Deepcast" in content
-    
-    @pytest.mark.integration
-    def test_full_workflow_with_default_output_path(self, sample_transcript_file, mock_environment):
+        if response is not None:
+            mock_openai_client.chat.completions.create.return_value = stream_response(response)
+        output_path = tmp_path / "output-deepcast.md"
+        
+        # Run the full workflow
+        generator = DeepcastGenerator(verbose=False, **generator_kwargs)
+        generator.generate_breakdown(sample_transcript_file, str(output_path))
+        
+        # Verify OpenAI was called once with the configured settings
+        mock_openai_client.chat.completions.create.assert_called_once()
+        call_args = mock_openai_client.chat.completions.create.call_args
+        for name, value in expected_request.items():
+            assert call_args[1][name] == value
+        
+        # Verify output file content, finding every expected phrase in a single pass
+        content = output_path.read_text()
+        found = re.findall("|".join(map(re.escape, expected_content)), content)
+        assert set(found) == set(expected_content)
+    
+    @pytest.mark.integration
+    def test_full_workflow_with_default_output_path(self, sample_transcript_file, mock_environment, mock_openai_client,
+                                                    tmp_path, monkeypatch):
         """Test workflow with automatic output path generation."""
-        with patch('openai.OpenAI') as mock_openai:
-            # Mock OpenAI response
-            mock_client = mock_openai.return_value
-            mock_response = mock_client.chat.completions.create.return_value
-            mock_response.choices[0].message.content = "# Generated Deepcast\n\nContent here"
-            
-            # Run workflow without specifying output path
-            generator = DeepcastGenerator(verbose=False)
-            generator.generate_breakdown(sample_transcript_file)
-            
-            # Verify default output file was created
-            # The filename is based on the actual temp file name, not "sample_transcript"
-            base_name = os.path.splitext(os.path.basename(sample_transcript_file))[0]
-            expected_output = f"{base_name}-deepcast.md"
-            assert os.path.exists(expected_output)
-            
-            # Cleanup
-            try:
-                os.unlink(expected_output)
-            except OSError:
-                pass
-    
-    @pytest.mark.integration
-    def test_workflow_with_verbose_output(self, sample_transcript_file, mock_environment):
+        # The default output lands in the working directory, so give each test its own
+        monkeypatch.chdir(tmp_path)
+        
+        # Run workflow without specifying output path
+        generator = DeepcastGenerator(verbose=False)
+        generator.generate_breakdown(sample_transcript_file)
+        
+        # Verify default output file was created
+        # The filename is based on the actual temp file name, not "sample_transcript"
+        base_name = os.path.splitext(os.path.basename(sample_transcript_file))[0]
+        assert (tmp_path / f"{base_name}-deepcast.md").exists()
+    
+    @pytest.mark.integration
+    def test_workflow_with_verbose_output(self, sample_transcript_file, mock_environment, mock_openai_client, tmp_path,
+                                          caplog):
         """Test workflow with verbose output enabled."""
-        with patch('openai.OpenAI') as mock_openai:
-            # Mock OpenAI response
-            mock_client = mock_openai.return_value
-            mock_response = mock_client.chat.completions.create.return_value
-            mock_response.choices[0].message.content = "# Generated Deepcast\n\nContent here"
-            
-            # Create generator and mock its console
-            generator = DeepcastGenerator(verbose=True)
-            with patch.object(generator.console, 'print') as mock_console:
-                generator.generate_breakdown(sample_transcript_file, "verbose-output.md")
-                
-                # Verify verbose messages were printed
-                assert mock_console.call_count >= 2  # Loading + success messages
-    
-    @pytest.mark.integration
-    def test_workflow_with_custom_model_and_temperature(self, sample_transcript_file, mock_environment):
-        """Test workflow with custom model and temperature settings."""
-        with patch('openai.OpenAI') as mock_openai:
-            # Mock OpenAI response
-            mock_client = mock_openai.return_value
-            mock_response = mock_client.chat.completions.create.return_value
-            mock_response.choices[0].message.content = "# Generated Deepcast\n\nContent here"
-            
-            # Run workflow with custom parameters
-            generator = DeepcastGenerator(model="gpt-4", temperature=0.3, verbose=False)
-            generator.generate_breakdown(sample_transcript_file, "custom-output.md")
-            
-            # Verify OpenAI was called with custom parameters
-            call_args = mock_client.chat.completions.create.call_args
-            assert call_args[1]['model'] == "gpt-4"
-            assert call_args[1]['temperature'] == 0.3
-    
-    @pytest.mark.integration
-    def test_workflow_error_handling(self, sample_transcript_file, mock_environment):
+        caplog.set_level(logging.INFO, logger="deepcast_post")
+        generator = DeepcastGenerator(verbose=True)
+        generator.generate_breakdown(sample_transcript_file, str(tmp_path / "verbose-output.md"))
+        
+        # Verify progress messages were logged
+        assert "Loading transcript from:" in caplog.text
+        assert "Estimated tokens:" in caplog.text
+    
+    @pytest.mark.integration
+    def test_workflow_error_handling(self, sample_transcript_file, mock_environment, mock_openai_client, tmp_path):
         """Test workflow error handling when OpenAI API fails."""
-        with patch('openai.OpenAI') as mock_openai:
-            # Mock OpenAI to raise an error
-            mock_client = mock_openai.return_value
-            mock_client.chat.completions.create.side_effect = Exception("API rate limit exceeded")
-            
-            # Run workflow and expect error
-            generator = DeepcastGenerator(verbose=False)
-            
-            with pytest.raises(Exception, match="OpenAI API error: API rate limit exceeded"):
-                generator.generate_breakdown(sample_transcript_file, "error-output.md")
-    
-    @pytest.mark.integration
-    def test_workflow_with_large_transcript(self, mock_environment, temp_output_dir):
+        # Mock OpenAI to raise an error
+        mock_openai_client.chat.completions.create.side_effect = Exception("API rate limit exceeded")
+        
+        # Run workflow and expect error
+        generator = DeepcastGenerator(verbose=False)
+        
+        with pytest.raises(Exception, match="OpenAI API error: API rate limit exceeded"):
+            generator.generate_breakdown(sample_transcript_file, str(tmp_path / "error-output.md"))
+    
+    @pytest.mark.integration
+    def test_workflow_rejects_transcript_over_context_window(self, mock_environment, mock_openai_client, tmp_path):
+        """Test a transcript too long for the model's context window never reaches the API."""
+        transcript_file = tmp_path / "long-transcript.txt"
+        transcript_file.write_text("[00:00:00] Speaker A: " + "word " * 10000)
+        output_path = tmp_path / "long-deepcast.md"
+        
+        generator = DeepcastGenerator(model="gpt-4", max_tokens=1000)
+        with pytest.raises(ValueError, match="Transcript too large"):
+            generator.generate_breakdown(str(transcript_file), str(output_path))
+        
+        mock_openai_client.chat.completions.create.assert_not_called()
+        assert not output_path.exists()
+    
+    @pytest.mark.integration
+    def test_workflow_with_large_transcript(self, mock_environment, tmp_path, stream_response, mock_openai_client):
         """Test workflow with a large transcript file."""
         # Create a large transcript
         large_transcript = "Speaker A: " + "This is a test sentence. " * 1000
+        large_file = tmp_path / "large.txt"
+        large_file.write_bytes(large_transcript.encode())
+        output_path = tmp_path / "large-output-deepcast.md"
         
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
-            f.write(large_transcript)
-            large_file = f.name
-        
-        try:
-            output_path = os.path.join(temp_output_dir, "large-output-deepcast.md")
-            
-            with patch('openai.OpenAI') as mock_openai:
-                # Mock OpenAI response
-                mock_client = mock_openai.return_value
-                mock_response = mock_client.chat.completions.create.return_value
-                mock_response.choices[0].message.content = "# Large Transcript Breakdown\n\nContent here"
-                
-                # Run workflow with large transcript
-                generator = DeepcastGenerator(verbose=False)
-                generator.generate_breakdown(large_file, output_path)
-                
-                # Verify OpenAI was called with large prompt
-                call_args = mock_client.chat.completions.create.call_args
-                prompt = call_args[1]['messages'][1]['content']
-                assert len(prompt) > 10000  # Large prompt
-                assert large_transcript in prompt
-                
-                # Verify output file was created
-                assert os.path.exists(output_path)
-        
-        finally:
-            # Cleanup
-            try:
-                os.unlink(large_file)
-            except OSError:
-                pass
-    
-    @pytest.mark.integration
-    def test_workflow_output_format_validation(self, sample_transcript_file, mock_environment, temp_output_dir):
-        """Test that the output format matches expected structure."""
-        output_path = os.path.join(temp_output_dir, "format-test-deepcast.md")
-        
-        with patch('openai.OpenAI') as mock_openai:
-            # Mock OpenAI response with structured content
-            mock_client = mock_openai.return_value
-            mock_response = mock_client.chat.completions.create.return_value
-            mock_response.choices[0].message.content = """# Deepcast Breakdown
-
-## Main Themes
-- **Theme 1:** Description
-- **Theme 2:** Description
-
-## Speaker Notes
-**Speaker A:** Description
-**Speaker B:** Description
+        mock_openai_client.chat.completions.create.return_value = stream_response("# Large Transcript Breakdown\n\nContent here")
+        
+        # Run workflow with large transcript
+        generator = DeepcastGenerator(verbose=False)
+        generator.generate_breakdown(str(large_file), str(output_path))
+        
+        # Verify OpenAI was called with large prompt
+        call_args = mock_openai_client.chat.completions.create.call_args
+        prompt = call_args[1]['messages'][1]['content']
+        assert len(prompt) > 10000  # Large prompt
+        assert large_transcript.strip() in prompt
+        
+        # Verify output file was created
+        assert output_path.exists()
+    
+    @pytest.mark.integration
+    def test_workflow_atomic_write_on_failure(self, sample_transcript_file, mock_environment, tmp_path,
+                                              stream_response, mock_openai_client):
+        """Test a stream that fails mid-write leaves no partial output behind."""
+        output_path = tmp_path / "output-deepcast.md"
+        output_path.write_text("# Previous breakdown")
+        
+        def failing_stream():
+            yield from stream_response("# Partial")
+            raise ConnectionError("connection reset")
+        
+        mock_openai_client.chat.completions.create.return_value = failing_stream()
+        
+        generator = DeepcastGenerator(verbose=False)
+        with pytest.raises(Exception, match="OpenAI API error: connection reset"):
+            generator.generate_breakdown(sample_transcript_file, str(output_path))
+        
+        # The earlier output is untouched and the temporary file is cleaned up
+        assert output_path.read_text() == "# Previous breakdown"
+        assert [p.name for p in tmp_path.iterdir()] == ["output-deepcast.md"]
+    
+    @pytest.mark.integration
+    def test_batch_workflow_concurrent(self, mock_environment, tmp_path, monkeypatch, mock_async_openai_client):
+        """Test batch generation sends every transcript and writes each output."""
+        monkeypatch.chdir(tmp_path)
+        paths = []
+        for name in ("episode-1", "episode-2", "episode-3"):
+            transcript = tmp_path / f"{name}.txt"
+            transcript.write_text(f"[00:00:00] Speaker A: {name}")
+            paths.append(str(transcript))
+        missing = str(tmp_path / "missing.txt")
+        
+        generator = DeepcastGenerator(verbose=False)
+        results = generator.generate_batch(paths + [missing], concurrency=2)
+        
+        # One shared client, one request per readable transcript
+        assert mock_async_openai_client.chat.completions.create.await_count == 3
+        mock_async_openai_client.close.assert_awaited_once()
+        
+        assert results[:3] == ["episode-1-deepcast.md", "episode-2-deepcast.md", "episode-3-deepcast.md"]
+        assert isinstance(results[3], FileNotFoundError)
+        for output_path in results[:3]:
+            assert (tmp_path / output_path).read_text() == "# Batch Deepcast"
+    
+    @pytest.mark.integration
+    def test_batch_workflow_file_io_off_event_loop(self, mock_environment, tmp_path, mock_async_openai_client):
+        """Test batch generation reads transcripts and writes outputs outside the event loop thread."""
+        transcript = tmp_path / "episode.txt"
+        transcript.write_text("[00:00:00] Speaker A: Hello")
+        generator = DeepcastGenerator(verbose=False)
+        io_threads = []
+        
+        def record_thread(method):
+            def wrapper(*args):
+                io_threads.append(threading.get_ident())
+                return method(*args)
+            return wrapper
+        
+        with patch.object(generator, 'load_transcript', record_thread(generator.load_transcript)), \
+             patch.object(generator, '_write_output', record_thread(generator._write_output)):
+            results = generator.generate_batch([str(transcript)], [str(tmp_path / "episode.md")])
+        
+        assert results == [str(tmp_path / "episode.md")]
+        assert len(io_threads) == 2
+        assert threading.get_ident() not in io_threads
+    
+    @pytest.mark.integration
+    def test_batch_workflow_custom_output_paths(self, mock_environment, tmp_path, mock_async_openai_client):
+        """Test batch generation writes each breakdown to its requested output path."""
+        paths = []
+        outputs = []
+        for name in ("episode-1", "episode-2"):
+            transcript = tmp_path / f"{name}.txt"
+            transcript.write_text(f"[00:00:00] Speaker A: {name}")
+            paths.append(str(transcript))
+            outputs.append(str(tmp_path / f"{name}-notes.md"))
+        
+        generator = DeepcastGenerator(verbose=False)
+        results = generator.generate_batch(paths, outputs)
+        
+        assert results == outputs
+        for output_path in outputs:
+            assert Path(output_path).read_text() == "# Batch Deepcast"
+        
+        with pytest.raises(ValueError, match="one entry per transcript"):
+            generator.generate_batch(paths, outputs[:1])
+        with pytest.raises(ValueError, match="same output file"):
+            generator.generate_batch(paths, [outputs[0], outputs[0]])
+    
+    @pytest.mark.integration
+    def test_batch_workflow_inside_event_loop(self, mock_environment, tmp_path, mock_async_openai_client):
+        """Test batch generation can be awaited from code already running an event loop."""
+        transcript = tmp_path / "episode.txt"
+        transcript.write_text("[00:00:00] Speaker A: Hello")
+        output_path = str(tmp_path / "episode.md")
+        generator = DeepcastGenerator(verbose=False)
+        
+        async def handler():
+            return await generator.generate_breakdowns([str(transcript)], [output_path])
+        
+        assert asyncio.run(handler()) == [output_path]
+        assert Path(output_path).read_text() == "# Batch Deepcast"
+    
+    @pytest.mark.integration
+    def test_batch_workflow_rejects_shared_default_output(self, mock_environment, tmp_path, monkeypatch,
+                                                          mock_async_openai_client):
+        """Test batch generation refuses transcripts whose default outputs collide."""
+        monkeypatch.chdir(tmp_path)
+        paths = []
+        for directory in ("a", "b"):
+            (tmp_path / directory).mkdir()
+            transcript = tmp_path / directory / "ep.txt"
+            transcript.write_text("[00:00:00] Speaker A: Hello")
+            paths.append(str(transcript))
+        
+        with pytest.raises(ValueError, match="ep-deepcast.md"):
+            DeepcastGenerator(verbose=False).generate_batch(paths)
+        
+        mock_async_openai_client.chat.completions.create.assert_not_called()
+        assert not (tmp_path / "ep-deepcast.md").exists()
+    
+    @pytest.mark.integration
+    def test_workflow_cache_hit(self, sample_transcript_file, mock_environment, tmp_path, monkeypatch, stream_response, mock_openai_client):
+        """Test re-running the same transcript with caching on makes one API call."""
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        mock_openai_client.chat.completions.create.return_value = stream_response("# Cached Deepcast")
+        
+        for run in ("first", "second"):
+            output_path = tmp_path / f"{run}.md"
+            DeepcastGenerator(cache=True).generate_breakdown(sample_transcript_file, str(output_path))
+            assert output_path.read_text() == "# Cached Deepcast"
+        
+        assert mock_openai_client.chat.completions.create.call_count == 1
+    
+    @pytest.mark.integration
+    def test_workflow_chunks_long_transcript(self, mock_environment, temp_output_dir, monkeypatch,
+                                             mock_async_openai_client):
+        """Test transcripts over the input limit are broken down in chunks and merged."""
+        monkeypatch.setenv("OPENAI_MAX_INPUT_TOKENS", "50")
+        lines = [f"[00:00:{i:02d}] Speaker A: {'word ' * 20}\n" for i in range(6)]
+        transcript_path = os.path.join(temp_output_dir, "long-transcript.txt")
+        with open(transcript_path, 'w') as f:
+            f.write("".join(lines))
+        output_path = os.path.join(temp_output_dir, "long-deepcast.md")
+        
+        create = mock_async_openai_client.chat.completions.create
+        create.return_value.choices[0].message.content = "# Merged Deepcast"
+        
+        generator = DeepcastGenerator(verbose=False, chunk_long_transcripts=True)
+        generator.generate_breakdown(transcript_path, output_path)
+        
+        # Six ~130 character segments at ~200 characters per chunk: 6 map calls + 1 reduce
+        prompts = [c[1]['messages'][1]['content'] for c in create.call_args_list]
+        assert len(prompts) == 7
+        assert "Merge them into one breakdown" in prompts[-1]
+        
+        with open(output_path, 'r') as f:
+            assert f.read() == "# Merged Deepcast"
 
-## Executive Summary
-- Point 1
-- Point 2"""
-            
-            # Run workflow
-            generator = DeepcastGenerator(verbose=False)
-            generator.generate_breakdown(sample_transcript_file, output_path)
-            
-            # Verify output file structure
-            with open(output_path, 'r') as f:
-                content = f.read()
-                
-                # Check for expected sections
-                assert "## Main Themes" in content
-                assert "## Speaker Notes" in content
-                assert "## Executive Summary" in content
-                
-                # Check for proper markdown formatting
-                assert "**Speaker A:**" in content
-                assert "- **Theme 1:**" in content
-                assert "- Point 1" in content
+    @pytest.mark.integration
+    def test_workflow_chunks_long_transcript_inside_event_loop(self, mock_environment, tmp_path, monkeypatch,
+                                                               mock_async_openai_client):
+        """Test a long transcript can be chunked and merged from code already running an event loop."""
+        monkeypatch.setenv("OPENAI_MAX_INPUT_TOKENS", "50")
+        transcript_path = tmp_path / "long-transcript.txt"
+        transcript_path.write_text("".join(f"[00:00:{i:02d}] Speaker A: {'word ' * 20}\n" for i in range(6)))
+        output_path = str(tmp_path / "long-deepcast.md")
+        generator = DeepcastGenerator(verbose=False, chunk_long_transcripts=True)
+        
+        async def handler():
+            return await generator.agenerate_breakdown(str(transcript_path), output_path)
+        
+        assert asyncio.run(handler()) == output_path
+        assert mock_async_openai_client.chat.completions.create.await_count == 7
+        assert Path(output_path).read_text() == "# Batch Deepcast"
+    
+    @pytest.mark.integration
+    def test_workflow_chunk_requests_bounded(self, mock_environment, tmp_path, monkeypatch, mock_async_openai_client):
+        """Test a transcript split into many chunks keeps a bounded number of requests in flight."""
+        monkeypatch.setenv("OPENAI_MAX_INPUT_TOKENS", "200")
+        transcript_path = tmp_path / "long-transcript.txt"
+        transcript_path.write_text("".join(f"[00:00:{i:02d}] Speaker A: {'word ' * 20}\n" for i in range(60)))
+        in_flight = []
+        peak = []
+        
+        async def create(**request):
+            in_flight.append(request)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0)
+            in_flight.pop()
+            return mock_async_openai_client.chat.completions.create.return_value
+        
+        mock_async_openai_client.chat.completions.create.side_effect = create
+        generator = DeepcastGenerator(verbose=False, chunk_long_transcripts=True)
+        generator.generate_breakdown(str(transcript_path), str(tmp_path / "long-deepcast.md"))
+        
+        # Six ~30 token segments per chunk: 10 map calls + 1 reduce
+        assert len(peak) == 11
+        assert max(peak) == 8
+    
+    @pytest.mark.integration
+    @pytest.mark.parametrize("transcript,partial,expected_calls,message", [
+        ("Speaker A: " + "x" * 400, "# Partial", 0, "Transcript segment too large to split"),
+        ("".join(f"[00:00:{i:02d}] Speaker A: {'word ' * 20}\n" for i in range(6)), "word " * 40, 6,
+         "Chunk breakdowns too large to merge"),
+    ], ids=["oversized_segment", "oversized_merge"])
+    def test_workflow_chunking_respects_input_limit(self, mock_environment, tmp_path, monkeypatch,
+                                                    mock_async_openai_client,
+                                                    transcript, partial, expected_calls, message):
+        """Test chunked generation never sends a prompt over the input limit."""
+        monkeypatch.setenv("OPENAI_MAX_INPUT_TOKENS", "50")
+        transcript_path = tmp_path / "long-transcript.txt"
+        transcript_path.write_text(transcript)
+        output_path = tmp_path / "long-deepcast.md"
+        
+        create = mock_async_openai_client.chat.completions.create
+        create.return_value.choices[0].message.content = partial
+        
+        generator = DeepcastGenerator(verbose=False, chunk_long_transcripts=True)
+        with pytest.raises(ValueError, match=message):
+            generator.generate_breakdown(str(transcript_path), str(output_path))
+        
+        assert create.call_count == expected_calls
+        assert not output_path.exists()